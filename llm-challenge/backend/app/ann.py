@@ -0,0 +1,197 @@
+# app/ann.py
+import os
+import numpy as np
+
+ASSIGN_BLOCK = 65536
+MIN_POINTS_PER_LIST = 39  # below this k-means centroids are mostly noise
+SAMPLE_POINTS_PER_LIST = 64
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGN_FILE = "ivf_assign.i32"
+
+
+def kmeans(sample: np.ndarray, nlist: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means on normalised rows. Returns (nlist, dim) unit centroids.
+    """
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Reseed empty lists from random points so every list stays in use
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index over the rows of a LocalVectorStore.
+
+    Rows are bucketed by their nearest centroid; a query scores the centroids,
+    then only the rows in the `nprobe` closest lists. Files (inside `path`):
+      ivf_centroids.npy - (nlist, dimension) float32, memory-mapped on load
+      ivf_assign.i32    - list id per row, -1 until the index is trained
+
+    nlist=0 sizes each training to about sqrt(live rows) lists.
+    """
+
+    def __init__(self, path: str, dimension: int, capacity: int, nlist: int = 0, nprobe: int = 16):
+        self.dimension = dimension
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._centroids_path = os.path.join(path, CENTROIDS_FILE)
+        self._assign_path = os.path.join(path, ASSIGN_FILE)
+        self._capacity = capacity
+        self._order = None
+        self._order_count = 0
+
+        self.centroids = None
+        self._centroids_version = None
+        self._load_centroids()
+        if not os.path.exists(self._assign_path):
+            with open(self._assign_path, "wb") as f:
+                f.truncate(capacity * 4)
+            self._assign = self._open(capacity)
+            self._assign[:] = -1
+        else:
+            # The store may have grown while running with index="flat"
+            self._capacity = os.path.getsize(self._assign_path) // 4
+            self._assign = self._open(self._capacity)
+            self.reserve(capacity)
+
+    def _open(self, capacity: int):
+        return np.memmap(self._assign_path, dtype=np.int32, mode="r+", shape=(capacity,))
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _load_centroids(self):
+        if os.path.exists(self._centroids_path):
+            stat = os.stat(self._centroids_path)
+            version = (stat.st_ino, stat.st_mtime_ns)
+            if version != self._centroids_version:
+                self.centroids = np.load(self._centroids_path, mmap_mode="r")
+                self._centroids_version = version
+
+    def reload(self, capacity: int):
+        """
+        Pick up centroids and assignments another process wrote (it already
+        grew ivf_assign.i32 to `capacity`).
+        """
+        self._load_centroids()
+        if capacity > self._capacity:
+            self._assign.flush()
+            del self._assign
+            self._capacity = capacity
+            self._assign = self._open(capacity)
+        self._order = None
+
+    def reserve(self, capacity: int):
+        if capacity <= self._capacity:
+            return
+        self._assign.flush()
+        del self._assign
+        with open(self._assign_path, "r+b") as f:
+            f.truncate(capacity * 4)
+        self._assign = self._open(capacity)
+        self._assign[self._capacity:] = -1
+        self._capacity = capacity
+
+    def lists_for(self, live: int) -> int:
+        return self.nlist or max(1, round(live ** 0.5))
+
+    def can_train(self, live: int) -> bool:
+        return live >= MIN_POINTS_PER_LIST * self.lists_for(live)
+
+    def sample(self, vectors: np.ndarray, live_rows: np.ndarray, sample_size: int = 0) -> np.ndarray:
+        """
+        Copy of the live rows k-means is fitted on.
+        """
+        rng = np.random.default_rng(0)
+        sample_size = sample_size or SAMPLE_POINTS_PER_LIST * self.lists_for(len(live_rows))
+        if len(live_rows) > sample_size:
+            live_rows = np.sort(rng.choice(live_rows, sample_size, replace=False))
+        return np.array(vectors[live_rows])
+
+    def fit(self, sample: np.ndarray, live: int) -> np.ndarray:
+        return kmeans(sample, self.lists_for(live))
+
+    @staticmethod
+    def assign(vectors: np.ndarray, rows, centroids: np.ndarray) -> np.ndarray:
+        """
+        Nearest list of each (already normalised) row.
+        """
+        rows = np.asarray(rows)
+        labels = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), ASSIGN_BLOCK):
+            block = rows[start:start + ASSIGN_BLOCK]
+            labels[start:start + len(block)] = np.argmax(vectors[block] @ centroids.T, axis=1)
+        return labels
+
+    def install(self, centroids: np.ndarray, rows: np.ndarray, labels: np.ndarray):
+        """
+        Swap in newly trained centroids and the list of every live row.
+        """
+        # Replace, never rewrite in place: other processes may have it mapped
+        tmp_path = self._centroids_path + ".tmp.npy"
+        np.save(tmp_path, centroids)
+        os.replace(tmp_path, self._centroids_path)
+        self._centroids_version = None
+        self._load_centroids()
+        self._assign[:] = -1
+        self._assign[rows] = labels
+        self._assign.flush()
+        self._order = None
+
+    def add(self, vectors: np.ndarray, rows):
+        """
+        Assign (already normalised) rows to their nearest list.
+        """
+        rows = np.asarray(rows)
+        self._assign[rows] = self.assign(vectors, rows, self.centroids)
+        self._assign.flush()
+        self._order = None
+
+    def unassigned(self, count: int) -> np.ndarray:
+        return np.flatnonzero(self._assign[:count] < 0)
+
+    def candidates(self, query: np.ndarray, count: int, nprobe: int = None) -> np.ndarray:
+        """
+        Row ids (< count) falling in the nprobe lists closest to the query.
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        order, offsets = self._lists(count)
+        rows = np.concatenate([order[offsets[l]:offsets[l + 1]] for l in probe])
+        # Sorted rows keep the gather from the memmap sequential
+        return np.sort(rows)
+
+    def _lists(self, count: int):
+        """
+        Rows grouped by list id, rebuilt lazily after inserts/compaction.
+        """
+        if self._order is None or self._order_count != count:
+            assign = np.asarray(self._assign[:count])
+            order = np.argsort(assign, kind="stable")
+            offsets = np.searchsorted(assign[order], np.arange(len(self.centroids) + 1))
+            self._order, self._offsets, self._order_count = order, offsets, count
+        return self._order, self._offsets
+
+    def compact(self, keep: np.ndarray):
+        """
+        Mirror LocalVectorStore.compact(): slide kept rows down.
+        """
+        self._assign[:len(keep)] = self._assign[keep]
+        self._assign[len(keep):] = -1
+        self._assign.flush()
+        self._order = None
@@ -0,0 +1,520 @@
+# app/bm25.py
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Optional
+import numpy as np
+from app.config import settings
+from app.file_lock import FileLock
+
+# Identifiers such as "ab-1234", "j.doe@mail.com" or "v2.1" stay whole, and
+# their alphanumeric parts are indexed as well
+TERM_RE = re.compile(r"\w+(?:[-.@/]\w+)*")
+PART_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    terms = []
+    for match in TERM_RE.finditer(text.lower()):
+        term = match.group()
+        terms.append(term)
+        parts = PART_RE.findall(term)
+        if len(parts) > 1 or (parts and parts[0] != term):
+            terms.extend(parts)
+    return terms
+
+
+MERGE_MAIN_FRACTION = 8
+
+
+def _batches(values, size: int = 10000):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index over chunks, keyed by vector id.
+
+    Postings live in flat arrays: a sorted main segment in CSR form (per-term
+    `offsets` into `post_docs` / `post_tfs`) plus an append-only delta of
+    (term, doc, tf) triples for recent additions. Once the delta holds
+    `merge_postings` entries and 1/MERGE_MAIN_FRACTION as many as the main
+    segment (so merges get rarer as the index grows), it is merged into the
+    main segment and deleted chunks are compacted away: their postings, ids
+    and metadata are dropped and the live documents renumbered. Deletes
+    tombstone the document and adjust document frequencies immediately.
+
+    Per-chunk owner and document ids (from metadata "user_id" and
+    "document_id") are kept in arrays too, so search can be scoped to one
+    user's chunks without touching their metadata. A merge numbers the
+    documents by owner, so each user's main-segment documents form one range
+    and a search scoped to a user only scores that slice of each term's
+    postings; the delta is filtered by owner.
+
+    Layout on disk (inside `path`):
+      bm25.sqlite         - vocabulary, and per document its id, owner,
+                            length, live flag, metadata and the version of
+                            the write that last changed it
+      bm25_delta.i32      - delta postings as (term, doc, tf) rows, appended
+      bm25_main.<gen>.npz - main segment, rewritten only by a merge
+      lock                - flock()ed by every process using the directory
+    A write appends its postings and rows, so it costs what it changes.
+    Several processes can share the index: writes hold the lock exclusively
+    and searches shared, and each first catches up with what other
+    processes wrote since it last looked (a full reload after a merge).
+    Metadata stays in SQLite; search reads it for the returned hits only.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, merge_postings: int = 50000):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.merge_postings = merge_postings
+        self._lock = threading.RLock()
+        self._delta_path = os.path.join(path, "bm25_delta.i32")
+        os.makedirs(path, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(path, "lock"))
+        self._db = sqlite3.connect(os.path.join(path, "bm25.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._file_lock.exclusive():
+            info = self._open_db()
+            self._load(info)
+            if "main_docs" not in info:
+                # Main segment from before documents were numbered by owner
+                self._merge()
+
+    # ----- persistence -----
+    def _open_db(self) -> dict:
+        """
+        Create bm25.sqlite on first use (importing a bm25.json / bm25.npz
+        index from before it existed) and return the index info.
+        """
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value);
+            CREATE TABLE IF NOT EXISTS terms (term_id INTEGER PRIMARY KEY, term TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS docs (
+                doc INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                document_id INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                alive INTEGER NOT NULL,
+                metadata TEXT NOT NULL,
+                version INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS docs_version ON docs (version);
+        """)
+        info = self._info()
+        if not info:
+            legacy_meta, legacy_arrays = os.path.join(self.path, "bm25.json"), os.path.join(self.path, "bm25.npz")
+            with self._db:
+                if os.path.exists(legacy_meta):
+                    self._import_legacy(legacy_meta, legacy_arrays)
+                else:
+                    self._write_main("bm25_main.0.npz", np.zeros(1, dtype=np.int64),
+                                     np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32))
+                    self._set_info(main="bm25_main.0.npz", docs=0, main_docs=0, delta_len=0, version=0, merged=0)
+            for legacy in (legacy_meta, legacy_arrays):
+                if os.path.exists(legacy):
+                    os.remove(legacy)
+            info = self._info()
+        return info
+
+    def _import_legacy(self, meta_path: str, arrays_path: str):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with np.load(arrays_path) as arrays:
+            arrays = dict(arrays)
+        self._db.executemany("INSERT INTO terms (term_id, term) VALUES (?, ?)", enumerate(meta["vocab"]))
+        self._db.executemany(
+            "INSERT INTO docs (doc, id, user_id, document_id, length, alive, metadata, version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            (
+                (doc, vector_id or "", int(arrays["doc_user"][doc]), int(arrays["doc_document"][doc]),
+                 int(arrays["doc_len"][doc]), int(vector_id is not None), json.dumps(metadata or {}))
+                for doc, (vector_id, metadata) in enumerate(zip(meta["ids"], meta["metadata"]))
+            ),
+        )
+        self._write_main("bm25_main.0.npz", arrays["offsets"], arrays["post_docs"], arrays["post_tfs"])
+        delta = np.stack([arrays["delta_terms"], arrays["delta_docs"], arrays["delta_tfs"]], axis=1)
+        delta.astype(np.int32).tofile(self._delta_path)
+        self._set_info(main="bm25_main.0.npz", docs=len(meta["ids"]), delta_len=len(delta), version=0, merged=0)
+
+    def _info(self) -> dict:
+        return dict(self._db.execute("SELECT key, value FROM info"))
+
+    def _set_info(self, **values):
+        self._db.executemany("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", values.items())
+
+    def _write_main(self, name: str, offsets, post_docs, post_tfs):
+        tmp_path = os.path.join(self.path, name + ".tmp.npz")
+        np.savez(tmp_path, offsets=offsets, post_docs=post_docs, post_tfs=post_tfs)
+        os.replace(tmp_path, os.path.join(self.path, name))
+
+    def _read_delta(self, start: int, stop: int) -> np.ndarray:
+        if stop <= start:
+            return np.zeros((0, 3), dtype=np.int32)
+        return np.fromfile(self._delta_path, dtype=np.int32, count=3 * (stop - start),
+                           offset=12 * start).reshape(-1, 3)
+
+    def _load(self, info: dict):
+        """
+        Rebuild the in-memory index from disk.
+        """
+        with np.load(os.path.join(self.path, info["main"])) as main:
+            self._offsets = main["offsets"]
+            self._post_docs = main["post_docs"]
+            self._post_tfs = main["post_tfs"]
+        delta = self._read_delta(0, info["delta_len"])
+        self._delta_terms = array("i", delta[:, 0].tobytes())
+        self._delta_docs = array("i", delta[:, 1].tobytes())
+        self._delta_tfs = array("i", delta[:, 2].tobytes())
+        self._vocab = [term for (term,) in self._db.execute("SELECT term FROM terms ORDER BY term_id")]
+        self._term_ids = {term: i for i, term in enumerate(self._vocab)}
+        n_docs = info["docs"]
+        self._doc_len = np.zeros(n_docs, dtype=np.int32)
+        self._alive = np.zeros(n_docs, dtype=bool)
+        self._doc_user = np.zeros(n_docs, dtype=np.int64)
+        self._doc_document = np.zeros(n_docs, dtype=np.int64)
+        self._id_to_doc = {}  # id -> its latest doc, which may have been deleted since
+        for doc, vector_id, user_id, document_id, length, alive in self._db.execute(
+                "SELECT doc, id, user_id, document_id, length, alive FROM docs"):
+            self._doc_len[doc], self._alive[doc] = length, alive
+            self._doc_user[doc], self._doc_document[doc] = user_id, document_id
+            self._id_to_doc[vector_id] = doc
+        # Document frequencies: live postings per term
+        counts = np.diff(self._offsets)
+        terms = np.concatenate([np.repeat(np.arange(len(counts), dtype=np.int32), counts), delta[:, 0]])
+        docs = np.concatenate([self._post_docs, delta[:, 1]])
+        self._df = np.bincount(terms[self._alive[docs]], minlength=len(self._vocab)).astype(np.int32)
+        self._total_len = int(self._doc_len[self._alive].sum())
+        self._main_docs = info.get("main_docs", 0)
+        self._version = info["version"]
+        self._main = info["main"]
+
+    def _refresh(self):
+        """
+        Catch up with writes other processes made since this one last looked:
+        new terms, appended postings and added or deleted documents, or a full
+        reload after a merge renumbered the documents.
+        """
+        info = self._info()
+        if info["version"] == self._version:
+            return
+        if info["merged"] > self._version:
+            self._load(info)
+            return
+        self._vocab += [term for (term,) in self._db.execute(
+            "SELECT term FROM terms WHERE term_id >= ? ORDER BY term_id", (len(self._vocab),))]
+        for term_id in range(len(self._term_ids), len(self._vocab)):
+            self._term_ids[self._vocab[term_id]] = term_id
+        self._grow_df()
+        tail = self._read_delta(len(self._delta_terms), info["delta_len"])
+        self._delta_terms.frombytes(tail[:, 0].tobytes())
+        self._delta_docs.frombytes(tail[:, 1].tobytes())
+        self._delta_tfs.frombytes(tail[:, 2].tobytes())
+        known = len(self._alive)
+        self._grow_docs(info["docs"] - known)
+        deleted = []
+        for doc, vector_id, user_id, document_id, length, alive, metadata in self._db.execute(
+                "SELECT doc, id, user_id, document_id, length, alive, metadata FROM docs WHERE version > ?",
+                (self._version,)):
+            if doc >= known:
+                self._doc_len[doc], self._alive[doc] = length, alive
+                self._doc_user[doc], self._doc_document[doc] = user_id, document_id
+                self._id_to_doc[vector_id] = doc
+                self._total_len += length if alive else 0
+            elif self._alive[doc] and not alive:
+                deleted.append((doc, metadata))
+        # Postings of the new documents still alive count towards df
+        self._df += np.bincount(tail[:, 0][self._alive[tail[:, 1]]], minlength=len(self._df)).astype(np.int32)
+        self._tombstone(deleted)
+        self._version = info["version"]
+
+    def _grow_df(self):
+        self._df = np.concatenate([self._df, np.zeros(len(self._vocab) - len(self._df), dtype=np.int32)])
+
+    def _grow_docs(self, count: int):
+        self._doc_len = np.concatenate([self._doc_len, np.zeros(count, dtype=np.int32)])
+        self._alive = np.concatenate([self._alive, np.zeros(count, dtype=bool)])
+        self._doc_user = np.concatenate([self._doc_user, np.zeros(count, dtype=np.int64)])
+        self._doc_document = np.concatenate([self._doc_document, np.zeros(count, dtype=np.int64)])
+
+    def _tombstone(self, docs):
+        """
+        Mark (doc, metadata JSON) pairs dead in memory and take their terms
+        out of the document frequencies.
+        """
+        for doc, metadata in docs:
+            for term in set(tokenize(json.loads(metadata)["text"])):
+                self._df[self._term_ids[term]] -= 1
+            self._alive[doc] = False
+            self._total_len -= int(self._doc_len[doc])
+
+    @contextmanager
+    def _reading(self):
+        with self._lock, self._file_lock.shared():
+            self._refresh()
+            yield
+
+    @contextmanager
+    def _writing(self):
+        with self._lock, self._file_lock.exclusive():
+            self._refresh()
+            try:
+                yield
+            except BaseException:
+                # In-memory state may be half updated: reload it on next use
+                self._version = -1
+                raise
+
+    # ----- updates -----
+    def __len__(self):
+        with self._reading():
+            return int(self._alive.sum())
+
+    def _term_id(self, term: str, new_terms: list) -> int:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._vocab)
+            self._vocab.append(term)
+            self._term_ids[term] = term_id
+            new_terms.append((term_id, term))
+        return term_id
+
+    def _remove(self, ids) -> list:
+        """
+        Tombstone the live documents of ids; returns their doc numbers.
+        """
+        docs = [self._id_to_doc[vid] for vid in ids if vid in self._id_to_doc]
+        docs = [doc for doc in docs if self._alive[doc]]
+        for batch in _batches(docs):
+            self._tombstone(self._db.execute(
+                f"SELECT doc, metadata FROM docs WHERE doc IN ({', '.join('?' * len(batch))})", batch).fetchall())
+        return docs
+
+    def add(self, chunks):
+        """
+        chunks: list of {"id": str, "metadata": {"text": str, ...}}, the same
+        shape as vector upserts. Existing ids are replaced.
+        """
+        if not chunks:
+            return
+        chunks = list({chunk["id"]: chunk for chunk in chunks}.values())
+        with self._writing():
+            removed = self._remove([chunk["id"] for chunk in chunks])
+            first_doc = len(self._alive)
+            lengths, doc_terms, new_terms, rows = [], [], [], []
+            delta_start = len(self._delta_terms)
+            for doc, chunk in enumerate(chunks, start=first_doc):
+                counts = Counter(tokenize(chunk["metadata"]["text"]))
+                self._id_to_doc[chunk["id"]] = doc
+                lengths.append(sum(counts.values()))
+                for term, tf in counts.items():
+                    term_id = self._term_id(term, new_terms)
+                    doc_terms.append(term_id)
+                    self._delta_terms.append(term_id)
+                    self._delta_docs.append(doc)
+                    self._delta_tfs.append(tf)
+                rows.append((doc, chunk["id"], chunk["metadata"].get("user_id", -1),
+                             chunk["metadata"].get("document_id", -1), lengths[-1], 1, json.dumps(chunk["metadata"])))
+            self._total_len += sum(lengths)
+            self._grow_docs(len(chunks))
+            self._doc_len[first_doc:] = lengths
+            self._alive[first_doc:] = True
+            self._doc_user[first_doc:] = [row[2] for row in rows]
+            self._doc_document[first_doc:] = [row[3] for row in rows]
+            self._grow_df()
+            self._df += np.bincount(doc_terms, minlength=len(self._vocab)).astype(np.int32)
+
+            # Append the new postings at the committed end (past it may be the
+            # leftovers of a write that never committed), then commit
+            with open(self._delta_path, "ab") as f:
+                f.truncate(12 * delta_start)
+                np.stack([np.frombuffer(self._delta_terms, dtype=np.int32)[delta_start:],
+                          np.frombuffer(self._delta_docs, dtype=np.int32)[delta_start:],
+                          np.frombuffer(self._delta_tfs, dtype=np.int32)[delta_start:]], axis=1).tofile(f)
+            self._version += 1
+            with self._db:
+                self._db.executemany("INSERT INTO terms (term_id, term) VALUES (?, ?)", new_terms)
+                self._db.executemany("UPDATE docs SET alive = 0, version = ? WHERE doc = ?",
+                                     ((self._version, doc) for doc in removed))
+                self._db.executemany(
+                    "INSERT INTO docs (doc, id, user_id, document_id, length, alive, metadata, version) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ((*row, self._version) for row in rows))
+                self._set_info(docs=len(self._alive), delta_len=len(self._delta_terms), version=self._version)
+            if len(self._delta_terms) >= max(self.merge_postings, len(self._post_docs) // MERGE_MAIN_FRACTION):
+                self._merge()
+
+    def delete(self, ids):
+        with self._writing():
+            removed = self._remove(ids)
+            if not removed:
+                return
+            self._version += 1
+            with self._db:
+                self._db.executemany("UPDATE docs SET alive = 0, version = ? WHERE doc = ?",
+                                     ((self._version, doc) for doc in removed))
+                self._set_info(version=self._version)
+
+    def _merge(self):
+        """
+        Fold the delta into a new main segment and compact away deleted
+        documents: their postings, ids and metadata. Live documents are
+        renumbered by owner, oldest first within each, and every term's
+        postings sorted by the new numbers, so a user's postings of a term
+        are one contiguous run.
+        """
+        keep = np.flatnonzero(self._alive)
+        keep = keep[np.argsort(self._doc_user[keep], kind="stable")]
+        renumber = np.full(len(self._alive), -1, dtype=np.int32)
+        renumber[keep] = np.arange(len(keep), dtype=np.int32)
+        n_terms = len(self._vocab)
+
+        counts = np.diff(self._offsets)
+        terms = np.concatenate([np.repeat(np.arange(len(counts), dtype=np.int32), counts),
+                                np.frombuffer(self._delta_terms, dtype=np.int32)])
+        docs = np.concatenate([self._post_docs, np.frombuffer(self._delta_docs, dtype=np.int32)])
+        tfs = np.concatenate([self._post_tfs, np.frombuffer(self._delta_tfs, dtype=np.int32)])
+        live = self._alive[docs]
+        terms, docs, tfs = terms[live], renumber[docs[live]], tfs[live]
+        order = np.lexsort((docs, terms))
+        post_docs, post_tfs = docs[order], tfs[order]
+        offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=n_terms), out=offsets[1:])
+
+        self._version += 1
+        main = f"bm25_main.{self._version}.npz"
+        self._write_main(main, offsets, post_docs, post_tfs)
+        with self._db:
+            self._db.execute("DELETE FROM docs WHERE alive = 0")
+            # Move every row out of the way first: the new numbers permute the old
+            self._db.execute("UPDATE docs SET doc = -1 - doc")
+            self._db.executemany("UPDATE docs SET doc = ? WHERE doc = ?",
+                                 ((new, -1 - int(old)) for new, old in enumerate(keep)))
+            self._set_info(main=main, docs=len(keep), main_docs=len(keep), delta_len=0, version=self._version,
+                           merged=self._version)
+        os.remove(os.path.join(self.path, self._main))
+        with open(self._delta_path, "wb"):
+            pass
+
+        # Document frequencies and total length only count live documents: unchanged
+        self._main = main
+        self._offsets, self._post_docs, self._post_tfs = offsets, post_docs, post_tfs
+        self._delta_terms, self._delta_docs, self._delta_tfs = array("i"), array("i"), array("i")
+        self._id_to_doc = {vid: int(renumber[doc]) for vid, doc in self._id_to_doc.items() if self._alive[doc]}
+        self._doc_len, self._doc_user = self._doc_len[keep], self._doc_user[keep]
+        self._doc_document = self._doc_document[keep]
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._main_docs = len(keep)
+
+    # ----- search -----
+    def search(self, query: str, top_k: int = 20, user_id: int = None, document_ids=None) -> List[dict]:
+        """
+        Top chunks by BM25 score: [{"id", "score", "metadata"}], best first,
+        optionally only those owned by user_id and/or in document_ids.
+        Collection statistics (idf, average length) stay global. Only the
+        owner's postings are scored: a slice of each main-segment run, found
+        by binary search on the doc numbers, plus their delta postings.
+        """
+        with self._reading():
+            n_docs = int(self._alive.sum())
+            term_ids = {self._term_ids[t] for t in tokenize(query) if t in self._term_ids}
+            if not n_docs or not term_ids:
+                return []
+            avg_len = self._total_len / n_docs
+            delta_terms = np.frombuffer(self._delta_terms, dtype=np.int32)
+            delta_docs = np.frombuffer(self._delta_docs, dtype=np.int32)
+            delta_tfs = np.frombuffer(self._delta_tfs, dtype=np.int32)
+            first_doc, end_doc = 0, self._main_docs
+            delta_mine = np.ones(len(delta_docs), dtype=bool)
+            if user_id is not None:
+                main_users = self._doc_user[:self._main_docs]
+                first_doc = int(np.searchsorted(main_users, user_id, side="left"))
+                end_doc = int(np.searchsorted(main_users, user_id, side="right"))
+                delta_mine = self._doc_user[delta_docs] == user_id
+            all_docs, all_scores = [], []
+            for term_id in term_ids:
+                df = int(self._df[term_id])
+                if df <= 0:
+                    continue
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                docs, tfs = [], []
+                if term_id + 1 < len(self._offsets):
+                    start, stop = self._offsets[term_id], self._offsets[term_id + 1]
+                    if user_id is not None:
+                        run = self._post_docs[start:stop]
+                        start, stop = start + np.searchsorted(run, [first_doc, end_doc])
+                    docs.append(self._post_docs[start:stop])
+                    tfs.append(self._post_tfs[start:stop])
+                in_delta = (delta_terms == term_id) & delta_mine
+                docs.append(delta_docs[in_delta])
+                tfs.append(delta_tfs[in_delta])
+                docs = np.concatenate(docs)
+                tfs = np.concatenate(tfs).astype(np.float64)
+                norm = self.k1 * (1 - self.b + self.b * self._doc_len[docs] / avg_len)
+                all_docs.append(docs)
+                all_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+            if not all_docs:
+                return []
+            docs, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+            live = self._alive[docs]
+            if document_ids:
+                live &= np.isin(self._doc_document[docs], list(document_ids))
+            docs, scores = docs[live], scores[live]
+            if len(docs) > top_k:
+                best = np.argpartition(-scores, top_k)[:top_k]
+                docs, scores = docs[best], scores[best]
+            # Ties go to the owner's older chunk, however the documents are numbered
+            order = np.lexsort((docs, self._doc_user[docs], -scores))
+            top_docs = [int(docs[i]) for i in order]
+            if not top_docs:
+                return []
+            found = {
+                doc: (vector_id, metadata) for doc, vector_id, metadata in self._db.execute(
+                    f"SELECT doc, id, metadata FROM docs WHERE doc IN ({', '.join('?' * len(top_docs))})", top_docs)
+            }
+            return [
+                {"id": found[doc][0], "score": float(scores[i]), "metadata": json.loads(found[doc][1])}
+                for i, doc in zip(order, top_docs)
+            ]
+
+    def stats(self) -> dict:
+        with self._reading():
+            return {
+                "documents": int(self._alive.sum()),
+                "terms": len(self._vocab),
+                "postings": int(len(self._post_docs) + len(self._delta_docs)),
+                "delta_postings": len(self._delta_docs),
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_keyword_index() -> Optional[BM25Index]:
+    """
+    The shared BM25Index, or None when HYBRID_SEARCH is false.
+    """
+    global _index
+    if _index is None and settings.HYBRID_SEARCH:
+        with _index_lock:
+            if _index is None:
+                _index = BM25Index(
+                    settings.BM25_INDEX_DIR,
+                    k1=settings.BM25_K1,
+                    b=settings.BM25_B,
+                    merge_postings=settings.BM25_MERGE_POSTINGS,
+                )
+    return _index
@@ -0,0 +1,191 @@
+# app/chunking.py
+import re
+from typing import Iterable, Iterator, List
+from app.config import settings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Linear-time patterns only: no nested quantifiers, so no backtracking blowups
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]*\s+")
+NUMBERED_HEADING_RE = re.compile(r"\d+(\.\d+)*\.?\s+\S")
+MAX_HEADING_CHARS = 80
+
+_encoding = None
+
+
+def _get_encoding():
+    # Loaded on first use: reading the BPE ranks costs a noticeable part of startup
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count with tiktoken when installed, else words + punctuation
+    (close to BPE counts for English prose).
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(TOKEN_RE.findall(text))
+
+
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_CHARS:
+        return False
+    if line.startswith("#"):
+        return True
+    if line[-1] in ".,;:!?":
+        return False
+    if NUMBERED_HEADING_RE.match(line):
+        return True
+    return line.isupper()
+
+
+def split_sentences(text: str, offset: int) -> Iterator[tuple]:
+    """
+    (sentence, offset) pairs; offset is absolute in the document text.
+    """
+    start = 0
+    for match in SENTENCE_END_RE.finditer(text):
+        yield text[start:match.end()].strip(), offset + start
+        start = match.end()
+    if start < len(text) and text[start:].strip():
+        yield text[start:].strip(), offset + start
+
+
+def split_long(sentence: str, offset: int, max_tokens: int) -> Iterator[tuple]:
+    """
+    Cut a sentence longer than max_tokens at word boundaries.
+    """
+    matches = list(TOKEN_RE.finditer(sentence))
+    for i in range(0, len(matches), max_tokens):
+        start = matches[i].start()
+        end = matches[min(i + max_tokens, len(matches)) - 1].end()
+        yield sentence[start:end], offset + start
+
+
+def iter_blocks(records: Iterable[dict]) -> Iterator[dict]:
+    """
+    Group page records into paragraphs and headings:
+    {"kind": "heading" | "paragraph", "text", "page", "offset"}.
+    A line split across records is held back until it is complete.
+    """
+    offset = 0  # document offset of the start of `tail`
+    tail = []  # pieces of the current, still incomplete line
+    tail_page = None  # page the incomplete line started on
+    lines, para_page, para_offset = [], None, 0
+
+    def paragraph():
+        return {"kind": "paragraph", "text": "\n".join(lines), "page": para_page, "offset": para_offset}
+
+    for record in records:
+        text = record["text"]
+        end = text.rfind("\n")
+        if end < 0:
+            if not any(tail):
+                tail_page = record["page"]
+            tail.append(text)
+            continue
+        line_page = tail_page if any(tail) else record["page"]
+        complete = "".join(tail) + text[:end]
+        tail = [text[end + 1:]]
+        tail_page = record["page"]
+        position = 0
+        for line in complete.split("\n"):
+            line_offset = offset + position
+            position += len(line) + 1
+            if not line.strip():
+                if lines:
+                    yield paragraph()
+                    lines = []
+            elif is_heading(line):
+                if lines:
+                    yield paragraph()
+                    lines = []
+                yield {"kind": "heading", "text": line.strip(), "page": line_page, "offset": line_offset}
+            else:
+                if not lines:
+                    para_page, para_offset = line_page, line_offset
+                lines.append(line)
+            line_page = record["page"]
+        offset += position
+    rest = "".join(tail)
+    if rest.strip():
+        if not lines:
+            para_page, para_offset = tail_page, offset
+        lines.append(rest)
+    if lines:
+        yield paragraph()
+
+
+def chunk_records(records: Iterable[dict], source: str = None, max_tokens: int = None,
+                  overlap_tokens: int = None) -> Iterator[dict]:
+    """
+    Pack sentences into chunks of at most max_tokens tokens, never crossing a
+    heading and repeating up to overlap_tokens of trailing sentences at the
+    start of the next chunk. Single pass over the records.
+
+    Yields {"text", "tokens", "source", "page", "offset"}; page and offset
+    (character offset in the extracted text) are those of the first sentence.
+    """
+    max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    units = []  # (text, tokens, page, offset)
+    size = 0
+
+    def emit():
+        return {
+            "text": " ".join(u[0] for u in units),
+            "tokens": size,
+            "source": source,
+            "page": units[0][2],
+            "offset": units[0][3],
+        }
+
+    def carry_overlap():
+        kept, kept_size = [], 0
+        for unit in reversed(units):
+            if kept_size + unit[1] > overlap_tokens:
+                break
+            kept.append(unit)
+            kept_size += unit[1]
+        kept.reverse()
+        return kept, kept_size
+
+    page = None
+    for block in iter_blocks(records):
+        page = block["page"] or page
+        if block["kind"] == "heading":
+            if units:
+                yield emit()
+            # A heading opens a new chunk and is not overlapped into
+            size = count_tokens(block["text"])
+            units = [(block["text"], size, page, block["offset"])]
+            continue
+        for sentence, sentence_offset in split_sentences(block["text"], block["offset"]):
+            tokens = count_tokens(sentence)
+            pieces = [(sentence, sentence_offset, tokens)]
+            if tokens > max_tokens:
+                pieces = [(p, o, count_tokens(p)) for p, o in split_long(sentence, sentence_offset, max_tokens)]
+            for text, piece_offset, tokens in pieces:
+                if units and size + tokens > max_tokens:
+                    yield emit()
+                    units, size = carry_overlap()
+                    if size + tokens > max_tokens:
+                        units, size = [], 0
+                units.append((text, tokens, page, piece_offset))
+                size += tokens
+    if units:
+        yield emit()
+
+
+def chunk_text(text: str, source: str = None, **kwargs) -> List[dict]:
+    return list(chunk_records([{"page": 1, "text": text}], source=source, **kwargs))
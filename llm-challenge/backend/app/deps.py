@@ -1,16 +1,13 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session, select, create_engine
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 from .models import User
 from jose import jwt, JWTError
 from .config import settings
+from .database import get_db
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-engine = create_engine("sqlite:///./database.db")
-
-def get_db():
-    with Session(engine) as session:
-        yield session
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     try:
@@ -22,7 +19,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise HTTPException(status_code=401, detail="Invalid authentication")
 
     stmt = select(User).where(User.username == username)
-    user = db.exec(stmt).first()
+    user = db.execute(stmt).scalars().first()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
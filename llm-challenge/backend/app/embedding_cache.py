@@ -0,0 +1,171 @@
+# app/embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+
+EVICT_CHECK_EVERY = 256  # puts between disk size checks
+EVICT_TARGET = 0.9  # evict down to this fraction of max_disk_bytes
+
+
+def normalize_text(text: str) -> str:
+    """
+    Whitespace-insensitive form used for cache keys.
+    """
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache.
+
+    Keys are sha256(model, normalised text). Lookups hit a per-process LRU
+    first, then a SQLite file shared by all workers (WAL mode, so readers
+    don't block the writer). Vectors are stored on disk as float16/float32
+    blobs; the least recently used rows are evicted once the file holds more
+    than `max_disk_bytes` of vectors.
+    """
+
+    def __init__(self, path: str, model: str, max_memory_items: int = 10000,
+                 max_disk_bytes: int = 1 << 30, dtype: str = "float16"):
+        self.path = path
+        self.model = model
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.dtype = np.dtype(dtype)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        db.commit()
+
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Cached vectors for `texts`, None where missing.
+        """
+        keys = [self.key(t) for t in texts]
+        results = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector.tolist()
+                    self.hits_memory += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+        if not missing:
+            return results
+
+        db = self._db()
+        found = {}
+        key_list = list(missing)
+        for start in range(0, len(key_list), 500):
+            batch = key_list[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=self.dtype).astype(np.float32)
+        if found:
+            now = time.time()
+            db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                           [(now, key) for key in found])
+            db.commit()
+
+        for key, positions in missing.items():
+            vector = found.get(key)
+            with self._lock:
+                if vector is None:
+                    self.misses += len(positions)
+                    continue
+                self.hits_disk += len(positions)
+            self._remember(key, vector)
+            for i in positions:
+                results[i] = vector.tolist()
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        if not texts:
+            return
+        now = time.time()
+        rows = []
+        for text, values in zip(texts, vectors):
+            key = self.key(text)
+            vector = np.asarray(values, dtype=np.float32)
+            self._remember(key, vector)
+            blob = vector.astype(self.dtype).tobytes()
+            rows.append((key, blob, len(blob), now))
+        db = self._db()
+        db.executemany("INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) "
+                       "VALUES (?, ?, ?, ?)", rows)
+        db.commit()
+
+        with self._lock:
+            before = self._puts
+            self._puts += len(rows)
+            check = before // EVICT_CHECK_EVERY != self._puts // EVICT_CHECK_EVERY
+        if check:
+            self.evict()
+
+    def evict(self):
+        """
+        Drop least recently used rows until the file is under EVICT_TARGET of the limit.
+        """
+        db = self._db()
+        total, count = db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM embeddings").fetchone()
+        if total <= self.max_disk_bytes or not count:
+            return
+        average = total / count
+        excess = int((total - EVICT_TARGET * self.max_disk_bytes) / average) + 1
+        db.execute("DELETE FROM embeddings WHERE key IN "
+                   "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,))
+        db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+            }
@@ -20,15 +20,114 @@
 
 
 # app/embeddings.py
-from dotenv import load_dotenv
-import os
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from app.config import settings
 
-load_dotenv()  # Load .env
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    """
+    One provider request for a batch of texts.
+    Replace with the real batched embedding call.
+    """
+    # Dummy vector: first value is 1.0, rest are zeros
+    return [[1.0] + [0.0] * 1023 for _ in texts]
+
+def _embed_batch_with_retry(texts: List[str]) -> List[List[float]]:
+    attempt = 0
+    while True:
+        try:
+            return _embed_batch(texts)
+        except Exception:
+            if attempt >= settings.EMBED_MAX_RETRIES:
+                raise
+            # Exponential backoff with jitter so parallel batches don't retry in lockstep
+            delay = settings.EMBED_RETRY_BACKOFF * (2 ** attempt)
+            time.sleep(delay * (0.5 + random.random()))
+            attempt += 1
+
+# Shared across requests so concurrent uploads respect one concurrency limit
+_executor = None
+_executor_lock = threading.Lock()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise RuntimeError("GROQ_API_KEY not set. Please add it to .env")
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.EMBED_MAX_CONCURRENCY,
+                    thread_name_prefix="embed",
+                )
+    return _executor
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """
+    The shared EmbeddingCache, or None when EMBED_CACHE_ENABLED is false.
+    """
+    global _cache
+    if _cache is None and settings.EMBED_CACHE_ENABLED:
+        with _cache_lock:
+            if _cache is None:
+                from app.embedding_cache import EmbeddingCache
+                _cache = EmbeddingCache(
+                    settings.EMBED_CACHE_PATH,
+                    settings.EMBED_MODEL,
+                    max_memory_items=settings.EMBED_CACHE_MEMORY_ITEMS,
+                    max_disk_bytes=settings.EMBED_CACHE_MAX_BYTES,
+                    dtype=settings.EMBED_CACHE_DTYPE,
+                )
+    return _cache
 
 def get_embedding(text: str):
-    # Dummy vector: first value is 1.0, rest are zeros
-    return [1.0] + [0.0] * 1023
+    return get_embeddings([text])[0]
+
+async def aget_embedding(text: str):
+    """
+    get_embedding() on a worker thread so the event loop isn't blocked.
+    """
+    return await asyncio.to_thread(get_embedding, text)
+
+def get_embeddings(texts: List[str], batch_size: int = None) -> List[List[float]]:
+    """
+    Embed many texts. Cached vectors are returned as-is; the rest are
+    de-duplicated, split into batches of `batch_size` (default EMBED_BATCH_SIZE),
+    run up to EMBED_MAX_CONCURRENCY batches at once with retry, then cached.
+    Returns vectors in the same order as `texts`.
+    """
+    if not texts:
+        return []
+    cache = get_cache()
+    if cache is None:
+        return _compute_embeddings(texts, batch_size)
+
+    embeddings = cache.get_many(texts)
+    missing = {}
+    for i, (text, vector) in enumerate(zip(texts, embeddings)):
+        if vector is None:
+            missing.setdefault(cache.key(text), []).append(i)
+    if missing:
+        miss_texts = [texts[positions[0]] for positions in missing.values()]
+        computed = _compute_embeddings(miss_texts, batch_size)
+        cache.put_many(miss_texts, computed)
+        for positions, vector in zip(missing.values(), computed):
+            for i in positions:
+                embeddings[i] = vector
+    return embeddings
+
+def _compute_embeddings(texts: List[str], batch_size: int = None) -> List[List[float]]:
+    batch_size = batch_size or settings.EMBED_BATCH_SIZE
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if len(batches) == 1:
+        return _embed_batch_with_retry(batches[0])
+
+    embeddings = []
+    for vectors in _get_executor().map(_embed_batch_with_retry, batches):
+        embeddings.extend(vectors)
+    return embeddings
@@ -25,49 +25,133 @@
 
 # app/extract_text.py
 import os
-from typing import List
+import importlib
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List
+from app.config import settings
+from app.chunking import chunk_records
 
-try:
-    import docx
-except ImportError:
-    docx = None
+SUPPORTED_TYPES = ("txt", "pdf", "docx")
 
-try:
-    import PyPDF2
-except ImportError:
-    PyPDF2 = None
+def _optional(module: str):
+    """
+    Import a parser library on first use (they cost ~100 ms of app startup);
+    None when not installed.
+    """
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        return None
 
-def extract_text(file_path: str) -> List[str]:
+TEXT_BLOCK_SIZE = 1 << 16  # characters per record when streaming .txt files
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Workers start on demand from whichever parse thread submits,
+                # and a forked child would inherit any lock another thread
+                # holds at that moment (e.g. one importing PyPDF2) and hang on
+                # it: start them from a fork server (or spawn) instead
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _pool = ProcessPoolExecutor(max_workers=settings.EXTRACT_PROCESSES,
+                                            mp_context=multiprocessing.get_context(method))
+    return _pool
+
+def _parse(worker, *args) -> list:
     """
-    Extract text from .txt, .pdf, .docx files.
-    Returns a list of chunks (for embedding).
+    Run a parse function in the shared process pool, off the GIL so parsing
+    doesn't stall the app's threads (in-thread when EXTRACT_PROCESSES is 0).
+    """
+    if settings.EXTRACT_PROCESSES < 1:
+        return worker(*args)
+    return _get_pool().submit(worker, *args).result()
+
+def _pdf_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Runs in a worker process: text of pages [start, stop).
+    """
+    with open(file_path, "rb") as f:
+        reader = _optional("PyPDF2").PdfReader(f)
+        return [(reader.pages[i].extract_text() or "") + "\n" for i in range(start, stop)]
+
+def _docx_paragraphs(file_path: str) -> List[str]:
+    """
+    Runs in a worker process: text of every paragraph.
+    """
+    return [para.text + "\n" for para in _optional("docx").Document(file_path).paragraphs]
+
+def _iter_pdf(file_path: str) -> Iterator[dict]:
+    with open(file_path, "rb") as f:
+        page_count = len(_optional("PyPDF2").PdfReader(f).pages)
+    if page_count < settings.EXTRACT_PARALLEL_MIN_PAGES or settings.EXTRACT_PROCESSES < 1:
+        # Small file: one task for the whole file
+        for i, text in enumerate(_parse(_pdf_page_range, file_path, 0, page_count)):
+            yield {"page": i + 1, "text": text}
+        return
+
+    # Big file: parse page ranges in worker processes, yielding in page order.
+    # At most 2 ranges per process are in flight so memory stays bounded.
+    step = settings.EXTRACT_PAGES_PER_TASK
+    ranges = iter(range(0, page_count, step))
+    in_flight = deque()
+    pool = _get_pool()
+    try:
+        for start in ranges:
+            in_flight.append((start, pool.submit(_pdf_page_range, file_path, start, min(start + step, page_count))))
+            if len(in_flight) >= 2 * settings.EXTRACT_PROCESSES:
+                break
+        while in_flight:
+            start, future = in_flight.popleft()
+            for i, text in enumerate(future.result()):
+                yield {"page": start + i + 1, "text": text}
+            next_start = next(ranges, None)
+            if next_start is not None:
+                in_flight.append((next_start, pool.submit(
+                    _pdf_page_range, file_path, next_start, min(next_start + step, page_count))))
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+
+def iter_pages(file_path: str) -> Iterator[dict]:
+    """
+    Lazily read .txt, .pdf, .docx files as {"page", "text"} records.
+    PDFs yield one record per page and .docx one per paragraph, parsed in a
+    process pool (large PDFs a page range per task); .txt yields one record
+    per block. .docx and .txt records are all page 1.
     """
     if not os.path.exists(file_path):
         raise ValueError(f"File {file_path} does not exist")
 
     ext = file_path.split(".")[-1].lower()
-    text = ""
 
     if ext == "txt":
         with open(file_path, "r", encoding="utf-8") as f:
-            text = f.read()
+            while block := f.read(TEXT_BLOCK_SIZE):
+                yield {"page": 1, "text": block}
     elif ext == "pdf":
-        if not PyPDF2:
+        if not _optional("PyPDF2"):
             raise ValueError("PyPDF2 not installed")
-        with open(file_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+        yield from _iter_pdf(file_path)
     elif ext == "docx":
+        docx = _optional("docx")
         if not docx:
             raise ValueError("python-docx not installed")
-        doc = docx.Document(file_path)
-        for para in doc.paragraphs:
-            text += para.text + "\n"
+        for text in _parse(_docx_paragraphs, file_path):
+            yield {"page": 1, "text": text}
     else:
         raise ValueError(f"Unsupported file type: {ext}")
 
-    # Split into chunks of ~500 characters for embeddings
-    chunk_size = 500
-    chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-    return chunks
+def extract_text(file_path: str) -> List[str]:
+    """
+    Extract text from .txt, .pdf, .docx files.
+    Returns a list of chunks (for embedding).
+    """
+    return [chunk["text"] for chunk in chunk_records(iter_pages(file_path), source=os.path.basename(file_path))]
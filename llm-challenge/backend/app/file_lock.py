@@ -0,0 +1,45 @@
+# app/file_lock.py
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single worker process
+    fcntl = None
+
+
+class FileLock:
+    """
+    Advisory flock() on a file, shared by every process that opens the same
+    index directory: readers hold it shared, writers exclusive.
+
+    Reentrant within a process (an exclusive hold covers nested shared or
+    exclusive ones); callers serialize their own threads around it.
+    """
+
+    def __init__(self, path: str):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._depth = 0
+        self._exclusive = False
+
+    @contextmanager
+    def _hold(self, exclusive: bool):
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._exclusive = exclusive
+        elif exclusive and not self._exclusive:
+            raise RuntimeError("Cannot take an exclusive lock while holding a shared one")
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0 and fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def shared(self):
+        return self._hold(False)
+
+    def exclusive(self):
+        return self._hold(True)
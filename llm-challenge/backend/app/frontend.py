@@ -1,7 +1,10 @@
+import json
+import time
 import streamlit as st
 import requests
 
 BACKEND_URL = "http://127.0.0.1:8000"
+HISTORY_PAGE_SIZE = 50
 
 # ------------------ Signup ------------------
 def signup():
@@ -77,7 +80,11 @@ def chat():
         return
 
     message = st.text_input("Your message:")
+    stream = st.checkbox("Stream response", value=True)
     if st.button("Send"):
+        if stream:
+            stream_chat(token, message)
+            return
         try:
             response = requests.post(
                 f"{BACKEND_URL}/chat",
@@ -99,6 +106,45 @@ def chat():
             st.error(f"Request failed: {e}")
 
 
+def iter_sse(response):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event = "message"
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            event = "message"
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):].strip())
+
+
+def stream_chat(token, message):
+    try:
+        with requests.post(
+            f"{BACKEND_URL}/chat",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"message": message, "stream": True},
+            stream=True
+        ) as response:
+            if response.status_code != 200:
+                st.error(f"Chat failed. Server response: {response.text}")
+                return
+            response.encoding = "utf-8"
+            st.write(f"**You:** {message}")
+            placeholder = st.empty()
+            text = ""
+            for event, data in iter_sse(response):
+                if event == "error":
+                    st.error(data.get("detail", "Streaming failed"))
+                    return
+                if event == "done":
+                    break
+                text += data["token"]
+                placeholder.markdown(f"**Bot:** {text}")
+    except Exception as e:
+        st.error(f"Request failed: {e}")
+
+
 # ------------------ Upload Document ------------------
 def upload_document():
     st.title("Upload Document")
@@ -107,7 +153,12 @@ def upload_document():
         st.warning("Please login first.")
         return
 
-    uploaded_file = st.file_uploader("Choose a file")
+    uploaded_files = st.file_uploader("Choose files (or a .zip)", accept_multiple_files=True)
+    if len(uploaded_files) > 1 or (uploaded_files and uploaded_files[0].name.lower().endswith(".zip")):
+        if st.button("Upload"):
+            upload_batch(token, uploaded_files)
+        return
+    uploaded_file = uploaded_files[0] if uploaded_files else None
     if uploaded_file and st.button("Upload"):
         try:
             files = {"file": (uploaded_file.name, uploaded_file)}
@@ -122,15 +173,106 @@ def upload_document():
                 st.error(f"Upload failed. Server response: {response.text}")
                 return
 
-            if response.status_code == 200:
+            if response.status_code == 202:
                 st.success(f"File uploaded: {data['filename']}")
-                st.write(f"URL: {data['url']}")
+                watch_upload(token, data["job_id"])
             else:
                 st.error(data.get("detail", f"Error: {response.status_code}"))
         except Exception as e:
             st.error(f"Request failed: {e}")
 
 
+def upload_batch(token, uploaded_files):
+    """Send several files in one /upload/batch request and follow the batch."""
+    try:
+        response = requests.post(
+            f"{BACKEND_URL}/upload/batch",
+            headers={"Authorization": f"Bearer {token}"},
+            files=[("files", (f.name, f)) for f in uploaded_files]
+        )
+        try:
+            data = response.json()
+        except requests.exceptions.JSONDecodeError:
+            st.error(f"Upload failed. Server response: {response.text}")
+            return
+        if response.status_code != 202:
+            st.error(data.get("detail", f"Error: {response.status_code}"))
+            return
+        st.success(f"{len(data['jobs'])} files queued.")
+        for skipped in data["skipped"]:
+            st.warning(f"Skipped {skipped['filename']}: {skipped['reason']}")
+        watch_batch(token, data["batch_id"])
+    except Exception as e:
+        st.error(f"Request failed: {e}")
+
+
+def watch_batch(token, batch_id):
+    """Poll /upload/batch/{batch_id} until every file is indexed or failed."""
+    table = st.empty()
+    progress = st.progress(0)
+    while True:
+        response = requests.get(
+            f"{BACKEND_URL}/upload/batch/{batch_id}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        if response.status_code != 200:
+            st.error(f"Failed to fetch upload status. Server response: {response.text}")
+            return
+        jobs = response.json()["jobs"]
+        finished = [job for job in jobs if job["status"] in ("done", "failed")]
+        progress.progress(len(finished) / len(jobs))
+        table.table([
+            {
+                "file": job["filename"],
+                "status": job["status"],
+                "pages": job["pages_parsed"],
+                "chunks": job["chunks_total"],
+                "upserted": job["vectors_upserted"],
+                "unchanged": job["chunks_unchanged"],
+                "error": job.get("error") or "",
+            }
+            for job in jobs
+        ])
+        if len(finished) == len(jobs):
+            failed = sum(job["status"] == "failed" for job in jobs)
+            if failed:
+                st.error(f"{failed} of {len(jobs)} files failed.")
+            else:
+                st.success("All documents indexed.")
+            return
+        time.sleep(1)
+
+
+def watch_upload(token, job_id):
+    """Poll /upload/{job_id} until ingestion finishes."""
+    status = st.empty()
+    progress = st.progress(0)
+    while True:
+        response = requests.get(
+            f"{BACKEND_URL}/upload/{job_id}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        if response.status_code != 200:
+            st.error(f"Failed to fetch upload status. Server response: {response.text}")
+            return
+        job = response.json()
+        total = job["chunks_total"] or 1
+        progress.progress(min((job["vectors_upserted"] + job["chunks_unchanged"]) / total, 1.0))
+        status.write(
+            f"{job['status']}: {job['pages_parsed']} pages parsed, "
+            f"{job['chunks_embedded']}/{job['chunks_total']} chunks embedded, "
+            f"{job['vectors_upserted']} vectors upserted, "
+            f"{job['chunks_unchanged']} chunks unchanged"
+        )
+        if job["status"] == "done":
+            st.success("Document indexed.")
+            return
+        if job["status"] == "failed":
+            st.error(job.get("error") or "Indexing failed.")
+            return
+        time.sleep(1)
+
+
 # ------------------ Chat History ------------------
 def chat_history():
     st.title("Chat History")
@@ -139,10 +281,34 @@ def chat_history():
         st.warning("Please login first.")
         return
 
+    # Newest first; older pages are fetched only when asked for
+    refresh = st.button("Refresh")
+    if refresh or "history_items" not in st.session_state:
+        st.session_state["history_items"] = []
+        st.session_state["history_cursor"] = None
+        st.session_state["history_done"] = False
+        fetch_history_page(token)
+
+    for chat in st.session_state["history_items"]:
+        st.write(f"**You:** {chat['message']}")
+        st.write(f"**Bot:** {chat['response']}")
+        st.write(f"*{chat['timestamp']}*")
+        st.markdown("---")
+
+    if not st.session_state["history_done"] and st.button("Load older"):
+        fetch_history_page(token)
+        st.rerun()
+
+
+def fetch_history_page(token, limit=HISTORY_PAGE_SIZE):
+    params = {"limit": limit, "order": "desc"}
+    if st.session_state["history_cursor"]:
+        params["cursor"] = st.session_state["history_cursor"]
     try:
         response = requests.get(
             f"{BACKEND_URL}/history",
-            headers={"Authorization": f"Bearer {token}"}
+            headers={"Authorization": f"Bearer {token}"},
+            params=params
         )
         try:
             data = response.json()
@@ -151,11 +317,9 @@ def chat_history():
             return
 
         if response.status_code == 200:
-            for chat in data:
-                st.write(f"**You:** {chat['message']}")
-                st.write(f"**Bot:** {chat['response']}")
-                st.write(f"*{chat['timestamp']}*")
-                st.markdown("---")
+            st.session_state["history_items"].extend(data)
+            st.session_state["history_cursor"] = response.headers.get("X-Next-Cursor")
+            st.session_state["history_done"] = st.session_state["history_cursor"] is None
         else:
             st.error(data.get("detail", f"Error: {response.status_code}"))
     except Exception as e:
@@ -0,0 +1,401 @@
+# app/ingest.py
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from app.config import settings
+from app.models import IngestionJob
+from app.extract_text import iter_pages
+from app.chunking import chunk_records
+from app.embeddings import get_embeddings
+from app.vector_db import upsert_vectors, delete_vectors, user_namespace
+from app.semantic_cache import get_semantic_cache
+from app.bm25 import get_keyword_index
+from app.metrics import StageClock, INGEST_DOCUMENTS, INGEST_PAGES, INGEST_CHUNKS
+from app import registry
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15
+
+
+class _File:
+    """
+    State of one claimed job while its group is processed.
+    """
+
+    def __init__(self, job_id: str, user_id: int, file_path: str, filename: str):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.file_path = file_path
+        self.filename = filename
+        self.namespace = user_namespace(user_id)
+        self.progress = {"pages_parsed": 0, "chunks_total": 0, "chunks_embedded": 0,
+                         "vectors_upserted": 0, "chunks_unchanged": 0}
+        # Per-document stage times; extraction runs inside chunking's pulls
+        self.clock = StageClock("upload")
+        self.document_id = None
+        self.file_hash = None
+        self.indexed = set()
+        self.registered = []  # (chunk_hash, vector_id) in document order
+        self.outstanding = 0  # chunks handed to embed/upsert and not upserted yet
+        self.parsed = False
+        self.orphaned = ()
+        self.status = None  # set once: done | unchanged | failed
+
+
+class IngestionWorker:
+    """
+    Background threads that drain the ingestion_job table.
+
+    Each thread claims one queued job at a time (SELECT ... FOR UPDATE SKIP
+    LOCKED, so several app processes can share the table), together with up
+    to INGEST_BATCH_MAX_FILES more jobs of the same /upload/batch. The files
+    are extracted and chunked on parse threads while their new chunks flow
+    into shared embedding and upsert batches, so embedding starts before
+    parsing finishes. Progress is recorded on each row. Running jobs refresh
+    updated_at; a job silent for longer than `stale_seconds` (its process
+    died) is put back in the queue.
+    """
+
+    def __init__(self, session_factory, threads: int = None,
+                 poll_interval: float = None, stale_seconds: int = None):
+        self.session_factory = session_factory
+        self.threads = threads or settings.INGEST_WORKERS
+        self.poll_interval = poll_interval or settings.INGEST_POLL_INTERVAL
+        self.stale_seconds = stale_seconds or settings.INGEST_STALE_SECONDS
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._run, name=f"ingest-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def notify(self):
+        """
+        Wake an idle thread now instead of at the next poll.
+        """
+        self._wake.set()
+
+    # ----- loop -----
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self._requeue_stale()
+                claimed = self._claim()
+            except Exception:
+                logger.exception("Ingestion queue poll failed")
+                claimed = None
+            if claimed:
+                self._process(claimed)
+                continue
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _requeue_stale(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        with self.session_factory() as db:
+            db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.status == "running", IngestionJob.updated_at < cutoff)
+                .values(status="queued")
+            )
+            db.commit()
+
+    def _claim(self):
+        """
+        The oldest queued job and, for a batch upload, more queued jobs of its
+        batch, as a list of (job_id, user_id, file_path, filename). A job whose
+        document another job is indexing waits until that one finishes.
+        """
+        running = aliased(IngestionJob)
+        claimable = (IngestionJob.status == "queued") & ~exists().where(
+            running.status == "running", running.user_id == IngestionJob.user_id,
+            running.filename == IngestionJob.filename,
+        )
+        with self.session_factory() as db:
+            job = db.execute(
+                select(IngestionJob)
+                .where(claimable)
+                .order_by(IngestionJob.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).scalars().first()
+            if job is None:
+                return None
+            jobs = [job]
+            if job.batch_id is not None and settings.INGEST_BATCH_MAX_FILES > 1:
+                jobs += db.execute(
+                    select(IngestionJob)
+                    .where(IngestionJob.batch_id == job.batch_id, claimable, IngestionJob.id != job.id)
+                    .order_by(IngestionJob.created_at)
+                    .limit(settings.INGEST_BATCH_MAX_FILES - 1)
+                    .with_for_update(skip_locked=True)
+                ).scalars().all()
+            claims = [(j.id, j.user_id, j.file_path, j.filename) for j in jobs]
+            # Conditional update: backends without row locks (SQLite) ignore
+            # FOR UPDATE, so only the thread that flips the status owns the job.
+            # The unique index on running jobs rejects a second job for a
+            # document that a concurrent claim has just started
+            claimed = []
+            for claim in claims:
+                try:
+                    with db.begin_nested():
+                        flipped = db.execute(
+                            update(IngestionJob)
+                            .where(IngestionJob.id == claim[0], IngestionJob.status == "queued")
+                            .values(status="running", updated_at=datetime.utcnow())
+                        ).rowcount
+                except IntegrityError:
+                    continue
+                if flipped:
+                    claimed.append(claim)
+            db.commit()
+            return claimed or None
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.utcnow()
+        with self.session_factory() as db:
+            db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(**fields))
+            db.commit()
+
+    # ----- pipeline -----
+    def _process(self, claims):
+        """
+        Index the claimed files together. Each file is extracted and chunked
+        on one of INGEST_PARSE_THREADS threads; this thread merges their new
+        chunks into embedding batches of INGEST_BATCH_SIZE and upserts of at
+        least INGEST_UPSERT_BATCH_SIZE vectors, and registers a file once its
+        last chunk is upserted. A file that fails to parse is marked failed
+        without stopping the others; an embedding or upsert error fails every
+        file still in flight.
+        """
+        files = [_File(*claim) for claim in claims]
+        keyword_index = get_keyword_index()
+        chunks = queue.Queue(maxsize=2 * settings.INGEST_BATCH_SIZE)  # bounds parse read-ahead
+        cancel = threading.Event()
+        batch, pending = [], []  # chunks to embed, vectors to upsert
+        last_update = time.monotonic()
+
+        def charge(items, stage: str, seconds: float):
+            """
+            Split a shared step's time across files by their share of items.
+            """
+            for file in {item["file"] for item in items}:
+                file.clock.add(stage, seconds * sum(item["file"] is file for item in items) / len(items))
+
+        def report(touched):
+            nonlocal last_update
+            for file in touched:
+                if file.status is None:
+                    self._update(file.job_id, **file.progress)
+            last_update = time.monotonic()
+
+        def embed():
+            start = time.perf_counter()
+            embeddings = get_embeddings([chunk["text"] for chunk in batch])
+            charge(batch, "embed", time.perf_counter() - start)
+            for chunk, embedding in zip(batch, embeddings):
+                file = chunk["file"]
+                file.progress["chunks_embedded"] += 1
+                pending.append({
+                    "file": file,
+                    "id": chunk["vector_id"],
+                    "values": embedding,
+                    "metadata": {
+                        "text": chunk["text"],
+                        "source": file.filename,
+                        "user_id": file.user_id,
+                        "document_id": file.document_id,
+                        "page": chunk["page"],
+                        "offset": chunk["offset"]
+                    }
+                })
+            touched = {chunk["file"] for chunk in batch}
+            batch.clear()
+            report(touched)
+
+        def upsert():
+            start = time.perf_counter()
+            by_namespace = {}
+            for vector in pending:
+                by_namespace.setdefault(vector["file"].namespace, []).append(
+                    {"id": vector["id"], "values": vector["values"], "metadata": vector["metadata"]})
+            for namespace, vectors in by_namespace.items():
+                upsert_vectors(vectors, namespace=namespace)
+                if keyword_index is not None:
+                    keyword_index.add(vectors)
+            charge(pending, "upsert", time.perf_counter() - start)
+            for vector in pending:
+                vector["file"].progress["vectors_upserted"] += 1
+                vector["file"].outstanding -= 1
+            touched = {vector["file"] for vector in pending}
+            pending.clear()
+            report(touched)
+            for file in touched:
+                if file.parsed and file.outstanding == 0 and file.status is None:
+                    self._finish(file, keyword_index)
+
+        try:
+            for file in files:
+                self._prepare(file)
+            active = [file for file in files if file.status is None]
+            threads = max(1, min(len(active), settings.INGEST_PARSE_THREADS))
+            with ThreadPoolExecutor(threads, thread_name_prefix="ingest-parse") as pool:
+                for file in active:
+                    pool.submit(self._parse, file, chunks, cancel)
+                try:
+                    remaining = len(active)
+                    while remaining:
+                        try:
+                            kind, file, item = chunks.get(timeout=HEARTBEAT_SECONDS)
+                        except queue.Empty:
+                            report(active)
+                            continue
+                        if kind == "chunk":
+                            if file.status is not None:
+                                continue  # the file failed: drop its remaining chunks
+                            file.outstanding += 1
+                            batch.append(item)
+                            if len(batch) >= settings.INGEST_BATCH_SIZE:
+                                embed()
+                                if len(pending) >= settings.INGEST_UPSERT_BATCH_SIZE:
+                                    upsert()
+                        else:
+                            remaining -= 1
+                            file.parsed = True
+                            if kind == "error":
+                                self._fail(file, item)
+                            elif file.outstanding == 0:
+                                self._finish(file, keyword_index)
+                        if time.monotonic() - last_update > HEARTBEAT_SECONDS:
+                            report(active)
+                    if batch:
+                        embed()
+                    if pending:
+                        upsert()
+                finally:
+                    cancel.set()
+        except Exception as e:
+            logger.exception("Ingestion of jobs %s failed", ", ".join(file.job_id for file in files))
+            for file in files:
+                if file.status is None:
+                    self._fail(file, e)
+
+    def _prepare(self, file: _File):
+        """
+        Look up the file's document; same bytes as the indexed version means
+        there is nothing to do.
+        """
+        try:
+            file.file_hash = registry.file_sha256(file.file_path)
+            with self.session_factory() as db:
+                document = registry.get_or_create_document(db, file.user_id, file.filename)
+                file.document_id = document.id
+                file.indexed = registry.indexed_vector_ids(db, file.document_id)
+                unchanged = document.file_hash == file.file_hash
+        except Exception as e:
+            logger.exception("Ingestion job %s failed", file.job_id)
+            self._fail(file, e)
+            return
+        if unchanged:
+            file.progress["chunks_unchanged"] = len(file.indexed)
+            self._complete(file, "unchanged", status="done", **file.progress)
+
+    def _parse(self, file: _File, out: queue.Queue, cancel: threading.Event):
+        """
+        Runs on a parse thread: puts ("chunk", file, chunk) for every chunk
+        not indexed yet, then ("end", file, None) or ("error", file, exception).
+        """
+        def put(item) -> bool:
+            while not cancel.is_set():
+                try:
+                    out.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def pages():
+            for record in file.clock.iterate(iter_pages(file.file_path), "extract"):
+                if record["page"] > file.progress["pages_parsed"]:
+                    file.progress["pages_parsed"] = record["page"]
+                yield record
+
+        seen = set()
+        try:
+            for chunk in file.clock.iterate(chunk_records(pages(), source=file.filename), "chunk"):
+                chunk_hash = registry.chunk_sha256(chunk["text"])
+                chunk["vector_id"] = registry.vector_id(file.document_id, chunk_hash)
+                file.registered.append((chunk_hash, chunk["vector_id"]))
+                file.progress["chunks_total"] += 1
+                if chunk["vector_id"] in file.indexed or chunk["vector_id"] in seen:
+                    file.progress["chunks_unchanged"] += 1
+                    continue
+                seen.add(chunk["vector_id"])
+                chunk["file"] = file
+                if not put(("chunk", file, chunk)):
+                    return
+        except Exception as e:
+            logger.exception("Ingestion job %s failed", file.job_id)
+            put(("error", file, e))
+            return
+        put(("end", file, None))
+
+    def _finish(self, file: _File, keyword_index):
+        """
+        Every new chunk of the file is upserted: delete vectors of chunks that
+        disappeared and record the indexed version.
+        """
+        try:
+            file.orphaned = file.indexed - {vid for _, vid in file.registered}
+            with file.clock.time("delete"):
+                if file.orphaned:
+                    delete_vectors(list(file.orphaned), namespace=file.namespace)
+                    if keyword_index is not None:
+                        keyword_index.delete(file.orphaned)
+            with file.clock.time("register"), self.session_factory() as db:
+                registry.replace_chunks(db, file.document_id, file.file_hash, file.registered)
+            cache = get_semantic_cache()
+            if cache is not None and (file.progress["vectors_upserted"] or file.orphaned):
+                cache.invalidate_document(file.document_id)
+        except Exception as e:
+            logger.exception("Ingestion job %s failed", file.job_id)
+            self._fail(file, e)
+            return
+        self._complete(file, "done", status="done", **file.progress)
+
+    def _fail(self, file: _File, error: Exception):
+        self._complete(file, "failed", status="failed", error=getattr(error, "detail", None) or str(error),
+                       **file.progress)
+
+    def _complete(self, file: _File, outcome: str, **fields):
+        """
+        Record the job's final row and its metrics, once.
+        """
+        file.status = outcome
+        try:
+            self._update(file.job_id, **fields)
+        finally:
+            if "chunk" in file.clock.totals:
+                # Time pulling chunks includes the extraction it triggered
+                file.clock.totals["chunk"] -= file.clock.totals.get("extract", 0.0)
+            file.clock.flush()
+            INGEST_DOCUMENTS.labels(outcome).inc()
+            INGEST_PAGES.inc(file.progress["pages_parsed"])
+            INGEST_CHUNKS.labels("embedded").inc(file.progress["chunks_embedded"])
+            INGEST_CHUNKS.labels("upserted").inc(file.progress["vectors_upserted"])
+            INGEST_CHUNKS.labels("unchanged").inc(file.progress["chunks_unchanged"])
+            INGEST_CHUNKS.labels("deleted").inc(len(file.orphaned))
@@ -1,29 +1,118 @@
 # app/llm.py
-import os
-import requests
-from dotenv import load_dotenv
+import json
+import threading
+import httpx
+from app.config import settings
 
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise RuntimeError("GROQ_API_KEY not set in .env")
-
-def query_llm(prompt: str):
-    """
-    Call Groq LLM API with a prompt and return the response text.
-    """
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
+def _headers() -> dict:
+    # Checked on first call, not at import, so the app can start without it
+    if not settings.GROQ_API_KEY:
+        raise RuntimeError("GROQ_API_KEY not set in .env")
+    return {
+        "Authorization": f"Bearer {settings.GROQ_API_KEY}",
         "Content-Type": "application/json"
     }
-    payload = {
-        "model": "llama-3.1-8b-instant",   # Or any supported model
+
+def _payload(prompt: str, stream: bool) -> dict:
+    return {
+        "model": settings.LLM_MODEL,
         "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.7,
-        "max_tokens": 512
+        "temperature": settings.LLM_TEMPERATURE,
+        "max_tokens": settings.LLM_MAX_TOKENS,
+        "stream": stream
     }
 
-    response = requests.post(url, json=payload, headers=headers)
+def _request(prompt: str, stream: bool):
+    import requests  # sync path only; keeps ~100 ms off app import
+    response = requests.post(settings.LLM_API_URL, json=_payload(prompt, stream),
+                             headers=_headers(), stream=stream)
     response.raise_for_status()
+    return response
+
+def query_llm(prompt: str, stream: bool = False):
+    """
+    Call Groq LLM API with a prompt and return the response text.
+    With stream=True, returns a generator of tokens instead.
+    """
+    if stream:
+        return stream_llm(prompt)
+    response = _request(prompt, stream=False)
     return response.json()["choices"][0]["message"]["content"]
+
+DONE = object()
+
+def _sse_token(line: str):
+    """
+    Token carried by one SSE line; None for other lines, DONE at the end marker.
+    """
+    if not line or not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return DONE
+    delta = json.loads(data)["choices"][0].get("delta", {})
+    return delta.get("content")
+
+def stream_llm(prompt: str):
+    """
+    Yield response tokens as they arrive on the OpenAI-compatible SSE stream.
+    """
+    with _request(prompt, stream=True) as response:
+        response.encoding = "utf-8"  # SSE is always UTF-8; requests would guess latin-1
+        for line in response.iter_lines(decode_unicode=True):
+            token = _sse_token(line)
+            if token is DONE:
+                break
+            if token:
+                yield token
+
+# ===== ASYNC CLIENT =====
+# One pooled client per process: keep-alive (and HTTP/2 multiplexing) instead
+# of a fresh TCP/TLS handshake per request. Create it on the event loop that
+# uses it (the app's warm-up does, or the first request).
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.AsyncClient(
+                    http2=settings.LLM_HTTP2,
+                    headers=_headers(),
+                    timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=10.0),
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE,
+                    ),
+                )
+    return _client
+
+async def close_client():
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+
+async def aquery_llm(prompt: str) -> str:
+    """
+    Async query_llm() over the shared client.
+    """
+    response = await get_client().post(settings.LLM_API_URL, json=_payload(prompt, False))
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
+
+async def astream_llm(prompt: str):
+    """
+    Async stream_llm() over the shared client.
+    """
+    async with get_client().stream("POST", settings.LLM_API_URL, json=_payload(prompt, True)) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            token = _sse_token(line)
+            if token is DONE:
+                break
+            if token:
+                yield token
@@ -0,0 +1,691 @@
+# app/local_index.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
+from app.ann import IVFIndex, ASSIGN_FILE
+from app.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CAPACITY = 1024
+COMPACT_BLOCK = 4096
+SCORE_BLOCK = 256  # quantized rows cast per step of a scan: the float32 buffer stays in L2
+REQUANTIZE_BLOCK = 16384
+QUANTIZED_DTYPES = {"float16": (np.float16, "f16"), "int8": (np.int8, "i8")}
+CODE_FILES = {"float16": ("vectors.f16",), "int8": ("vectors.i8", "scales.f32")}  # quantized copy per dtype
+
+
+def filter_sql(filter: dict):
+    """
+    SQL condition on the JSON `metadata` column, and its parameters, for a
+    Pinecone-style metadata filter: {"field": value} or {"field": {"$in": [...]}}.
+    """
+    clauses, params = [], []
+    for field, condition in filter.items():
+        path = '$."' + field + '"'
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        if "$in" in condition:
+            values = list(condition["$in"])
+            clauses.append(f"json_extract(metadata, ?) IN ({', '.join('?' * len(values))})")
+            params += [path, *values]
+        if "$eq" in condition:
+            clauses.append("json_extract(metadata, ?) IS ?")
+            params += [path, condition["$eq"]]
+    return " AND ".join(clauses) or "1", params
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalise rows so cosine similarity becomes a plain dot product.
+    """
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize(matrix: np.ndarray, dtype: str):
+    """
+    Codes for normalised float32 rows, and per-row scales (int8 only).
+    float16 is a plain cast; int8 maps each row's max |component| to 127.
+    """
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    return np.rint(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+class LocalVectorStore:
+    """
+    In-process cosine index over a memory-mapped float32 matrix.
+
+    Layout on disk (inside `path`):
+      vectors.f32  - row-major (capacity, dimension) float32, normalised
+      rows.sqlite  - row -> id / namespace / metadata (JSON), plus the store's
+                     dimension, dtype, capacity, row count and write version
+      lock         - flock()ed by every process using the directory
+      ivf_*        - optional IVF index files, see app/ann.py
+
+    Only id -> row, a live flag and a namespace code per row are kept in
+    memory; metadata is read from SQLite for filters and results. A write
+    appends or overwrites just its rows, so its cost follows the change, not
+    the store size. Several processes (uvicorn workers) can share a store:
+    writes hold the lock exclusively and queries shared, and each first
+    catches up with rows other processes changed since it last looked
+    (rows carry the version that wrote them; compaction forces a full reload).
+
+    With index="ivf" queries are exact until `train_size` live vectors exist
+    (and enough for `nlist`, 0 = about sqrt(live) lists), after which the IVF
+    lists are trained and queries scan `nprobe` lists. The lists are trained
+    again once the live count grows `retrain_growth`-fold. Training runs on
+    a background thread, k-means outside the lock on a snapshot of the rows.
+
+    With dtype="float16" or "int8", queries scan a quantized copy instead:
+      vectors.f16 / vectors.i8 - (capacity, dimension) codes
+      scales.f32               - per-row scale (int8 only)
+    A scan reads 1/2 or 1/4 of the bytes. Codes are widened to float32 a
+    block at a time for BLAS (NumPy has no fast float16 or int8 matmul), so
+    from RAM an int8 scan runs at about float32 speed and a float16 one
+    several times slower (NumPy widens float16 without SIMD); the gain is
+    that only the codes have to stay in the page cache, so a store too big
+    to cache as float32 still scans from memory. float16 keeps near-exact
+    recall without rescoring. vectors.f32 stays on disk for IVF
+    training, requantizing and rescoring, so disk use grows by a half or a
+    quarter (1.5x / 1.25x float32 alone, see stats()): the best `rescore`
+    quantized candidates are scored again at full precision (0 returns
+    quantized scores). Switching dtype requantizes the existing rows on
+    load, or deletes the codes when going to float32.
+
+    Each row belongs to a namespace ("" by default). A query restricted to a
+    namespace and/or a metadata filter scores only that pre-filtered row set,
+    exactly, unless it is itself larger than `train_size` (then its rows
+    among the IVF candidates).
+    """
+
+    def __init__(self, path: str, dimension: int, compact_ratio: float = 0.25,
+                 index: str = "flat", nlist: int = 0, nprobe: int = 16, train_size: int = 10000,
+                 retrain_growth: float = 2.0, dtype: str = "float32", rescore: int = 0):
+        if dtype != "float32" and dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Unknown vector dtype: {dtype} (float32, float16 or int8)")
+        if index not in ("flat", "ivf"):
+            raise ValueError(f"Unknown vector index type: {index}")
+        self.path = path
+        self.dimension = dimension
+        self.compact_ratio = compact_ratio
+        self.train_size = train_size
+        self.retrain_growth = retrain_growth
+        self._training = False
+        self.dtype = dtype
+        self.rescore = rescore
+        self._lock = threading.RLock()
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._meta_path = os.path.join(path, "meta.json")  # pre-SQLite layout, migrated on open
+        if dtype in QUANTIZED_DTYPES:
+            self._codes_path = os.path.join(path, f"vectors.{QUANTIZED_DTYPES[dtype][1]}")
+            self._scales_path = os.path.join(path, "scales.f32")
+        os.makedirs(path, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(path, "lock"))
+        self._db = sqlite3.connect(os.path.join(path, "rows.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._codes = self._scales = None
+        self.ivf = None
+        with self._lock, self._file_lock.exclusive():
+            info = self._open_rows()
+            self._load(info)
+            stored_dtype = info["dtype"]
+            if stored_dtype != self.dtype:
+                self._drop_codes(stored_dtype)
+                stored_dtype = "float32"
+            if self.dtype in QUANTIZED_DTYPES:
+                self._load_codes(stored_dtype)
+            if index == "ivf":
+                self.ivf = IVFIndex(path, dimension, self._capacity, nlist=nlist, nprobe=nprobe)
+                if self.ivf.trained:
+                    # Rows written while the store ran with index="flat"
+                    missing = self.ivf.unassigned(self._count)
+                    missing = missing[self._alive[missing]]
+                    if len(missing):
+                        self.ivf.add(self._vectors, missing)
+                    if "ivf_trained" not in info:
+                        # Trained before the live count at training was recorded
+                        with self._db:
+                            self._set_info(ivf_trained=len(self._id_to_row))
+                        self._ivf_trained = len(self._id_to_row)
+
+    # ----- persistence -----
+    def _open(self, capacity: int):
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                         shape=(capacity, self.dimension))
+
+    def _open_codes(self, capacity: int):
+        self._codes = np.memmap(self._codes_path, dtype=QUANTIZED_DTYPES[self.dtype][0], mode="r+",
+                                shape=(capacity, self.dimension))
+        self._scales = None
+        if self.dtype == "int8":
+            self._scales = np.memmap(self._scales_path, dtype=np.float32, mode="r+", shape=(capacity,))
+
+    def _code_files(self):
+        files = [(self._codes_path, np.dtype(QUANTIZED_DTYPES[self.dtype][0]).itemsize * self.dimension)]
+        if self.dtype == "int8":
+            files.append((self._scales_path, 4))
+        return files  # (path, bytes per row)
+
+    def _drop_codes(self, stored_dtype: str):
+        """
+        Delete a quantized copy written for another dtype: it would go stale
+        while this one is in use.
+        """
+        for name in CODE_FILES.get(stored_dtype, ()):
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+        with self._db:
+            self._set_info(dtype="float32")
+
+    def _load_codes(self, stored_dtype: str):
+        """
+        Open the quantized copy, rebuilding it from vectors.f32 when it is missing
+        or was not kept up to date.
+        """
+        current = stored_dtype == self.dtype and all(
+            os.path.exists(path) and os.path.getsize(path) >= self._capacity * row_bytes
+            for path, row_bytes in self._code_files()
+        )
+        if not current:
+            for path, row_bytes in self._code_files():
+                with open(path, "wb") as f:
+                    f.truncate(self._capacity * row_bytes)
+        self._open_codes(self._capacity)
+        if not current:
+            for start in range(0, self._count, REQUANTIZE_BLOCK):
+                stop = min(start + REQUANTIZE_BLOCK, self._count)
+                self._write_codes(np.arange(start, stop), np.asarray(self._vectors[start:stop]))
+            self._flush()
+            with self._db:
+                self._set_info(dtype=self.dtype)
+
+    def _write_codes(self, rows, matrix: np.ndarray):
+        if self._codes is None:
+            return
+        codes, scales = quantize(matrix, self.dtype)
+        self._codes[rows] = codes
+        if scales is not None:
+            self._scales[rows] = scales
+
+    def _open_rows(self) -> dict:
+        """
+        Create rows.sqlite on first use (importing a pre-SQLite meta.json) and
+        return the store info.
+        """
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value);
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                id TEXT,
+                namespace TEXT,  -- NULL once deleted
+                metadata TEXT,
+                version INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS rows_namespace ON rows (namespace);
+            CREATE INDEX IF NOT EXISTS rows_version ON rows (version);
+        """)
+        info = self._info()
+        if not info:
+            capacity, count, stored_dtype = INITIAL_CAPACITY, 0, "float32"
+            with self._db:
+                if os.path.exists(self._meta_path):
+                    capacity, count, stored_dtype = self._import_meta_json()
+                else:
+                    with open(self._vectors_path, "wb") as f:
+                        f.truncate(capacity * self.dimension * 4)
+                self._set_info(dimension=self.dimension, dtype=stored_dtype, capacity=capacity,
+                               count=count, version=0, compacted=0)
+            if os.path.exists(self._meta_path):
+                os.remove(self._meta_path)
+            info = self._info()
+        if info["dimension"] != self.dimension:
+            raise ValueError(
+                f"Index at {self.path} has dimension {info['dimension']}, expected {self.dimension}"
+            )
+        return info
+
+    def _import_meta_json(self):
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["dimension"] != self.dimension:
+            raise ValueError(
+                f"Index at {self.path} has dimension {meta['dimension']}, expected {self.dimension}"
+            )
+        namespaces = meta.get("namespaces") or ["" for _ in meta["ids"]]
+        self._db.executemany(
+            "INSERT INTO rows (row, id, namespace, metadata, version) VALUES (?, ?, ?, ?, 0)",
+            (
+                (row, vector_id, namespaces[row] if vector_id is not None else None,
+                 json.dumps(metadata) if vector_id is not None else None)
+                for row, (vector_id, metadata) in enumerate(zip(meta["ids"], meta["metadata"]))
+            ),
+        )
+        return meta["capacity"], len(meta["ids"]), meta.get("dtype", "float32")
+
+    def _info(self) -> dict:
+        return dict(self._db.execute("SELECT key, value FROM info"))
+
+    def _set_info(self, **values):
+        self._db.executemany("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", values.items())
+
+    def _load(self, info: dict):
+        """
+        Rebuild the in-memory row state from rows.sqlite.
+        """
+        self._capacity = info["capacity"]
+        self._count = info["count"]
+        self._version = info["version"]
+        self._compacted = info["compacted"]
+        self._ivf_trained = info.get("ivf_trained", 0)  # live rows when the IVF lists were trained
+        self._vectors = self._open(self._capacity)
+        if self._codes is not None:
+            self._open_codes(self._capacity)
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self._row_namespace = np.full(self._capacity, -1, dtype=np.int32)
+        self._namespace_codes = {}  # namespace -> code in _row_namespace
+        self._namespace_names = []  # code -> namespace
+        self._namespace_arrays = {}  # namespace -> sorted row array, rebuilt on change
+        self._id_to_row = {}
+        for row, vector_id, namespace in self._db.execute(
+                "SELECT row, id, namespace FROM rows WHERE namespace IS NOT NULL"):
+            self._set_row(row, vector_id, namespace)
+        self._dead = self._count - len(self._id_to_row)
+        if self.ivf is not None:
+            self.ivf.reload(self._capacity)
+
+    def _refresh(self):
+        """
+        Catch up with writes other processes made since this one last looked:
+        apply the rows written since our version, or reload after compaction.
+        """
+        info = self._info()
+        if info["version"] == self._version:
+            return
+        if info["compacted"] > self._version:
+            self._load(info)
+            return
+        if info["capacity"] != self._capacity:
+            self._remap(info["capacity"])
+        for row, vector_id, namespace in self._db.execute(
+                "SELECT row, id, namespace FROM rows WHERE version > ?", (self._version,)):
+            self._set_row(row, vector_id, namespace)
+        self._count = info["count"]
+        self._version = info["version"]
+        self._ivf_trained = info.get("ivf_trained", 0)
+        self._dead = self._count - len(self._id_to_row)
+        if self.ivf is not None:
+            self.ivf.reload(self._capacity)
+
+    def _set_row(self, row: int, vector_id: str, namespace):
+        """
+        Record row's id and namespace in memory; namespace None deletes it.
+        """
+        if namespace is None:
+            if self._id_to_row.get(vector_id) == row:
+                del self._id_to_row[vector_id]
+            self._alive[row] = False
+        else:
+            self._id_to_row[vector_id] = row
+            self._alive[row] = True
+        self._move_namespace(row, namespace)
+
+    def _move_namespace(self, row: int, namespace):
+        code = -1
+        if namespace is not None:
+            code = self._namespace_codes.get(namespace)
+            if code is None:
+                code = self._namespace_codes[namespace] = len(self._namespace_names)
+                self._namespace_names.append(namespace)
+        old = self._row_namespace[row]
+        if old == code:
+            return
+        if old >= 0:
+            self._namespace_arrays.pop(self._namespace_names[old], None)
+        self._namespace_arrays.pop(namespace, None)
+        self._row_namespace[row] = code
+
+    def _rows_in(self, namespace: str) -> np.ndarray:
+        rows = self._namespace_arrays.get(namespace)
+        if rows is None:
+            code = self._namespace_codes.get(namespace, -2)
+            rows = np.flatnonzero(self._row_namespace[:self._count] == code)
+            self._namespace_arrays[namespace] = rows
+        return rows
+
+    def _flush(self):
+        self._vectors.flush()
+        if self._codes is not None:
+            self._codes.flush()
+            if self._scales is not None:
+                self._scales.flush()
+
+    def _commit(self, records, **info):
+        """
+        Persist changed rows: records are (row, id, namespace, metadata JSON),
+        namespace None for a deleted row, and any extra info. Vectors are
+        flushed first, so the rows never point at unwritten vectors.
+        """
+        self._flush()
+        self._version += 1
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rows (row, id, namespace, metadata, version) VALUES (?, ?, ?, ?, ?)",
+                ((*record, self._version) for record in records),
+            )
+            self._set_info(capacity=self._capacity, count=self._count, version=self._version, **info)
+
+    @contextmanager
+    def _reading(self):
+        with self._lock, self._file_lock.shared():
+            self._refresh()
+            yield
+
+    @contextmanager
+    def _writing(self):
+        with self._lock, self._file_lock.exclusive():
+            self._refresh()
+            try:
+                yield
+            except BaseException:
+                # In-memory state may be half updated: reload it on next use
+                self._version = -1
+                raise
+
+    def _remap(self, capacity: int):
+        """
+        Reopen the memmaps at `capacity` (the files already have that size)
+        and grow the per-row arrays.
+        """
+        self._vectors.flush()
+        del self._vectors
+        self._vectors = self._open(capacity)
+        if self._codes is not None:
+            self._codes.flush()
+            del self._codes, self._scales
+            self._open_codes(capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._capacity] = self._alive
+        self._alive = alive
+        row_namespace = np.full(capacity, -1, dtype=np.int32)
+        row_namespace[:self._capacity] = self._row_namespace
+        self._row_namespace = row_namespace
+        self._capacity = capacity
+
+    def _drop_ivf_assignments(self):
+        """
+        Flat-mode writes that move or overwrite rows make the assignments of
+        an earlier index="ivf" run stale: drop them, so opening the store with
+        index="ivf" again assigns every row afresh.
+        """
+        assign_path = os.path.join(self.path, ASSIGN_FILE)
+        if self.ivf is None and os.path.exists(assign_path):
+            os.remove(assign_path)
+
+    def _reserve(self, needed: int):
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2)
+        files = [(self._vectors_path, self.dimension * 4)]
+        if self._codes is not None:
+            files += self._code_files()
+        for path, row_bytes in files:
+            with open(path, "r+b") as f:
+                f.truncate(capacity * row_bytes)
+        self._remap(capacity)
+        if self.ivf is not None:
+            self.ivf.reserve(capacity)
+
+    # ----- public API -----
+    def __len__(self):
+        with self._reading():
+            return len(self._id_to_row)
+
+    def upsert(self, vectors, namespace=None):
+        """
+        vectors: list of {"id": str, "values": [...], "metadata": {...}}.
+        Existing ids are overwritten in place (and moved to `namespace`).
+        """
+        if not vectors:
+            return {"upserted": 0, "requests": 0, "retries": 0, "failed": []}
+        matrix = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+        if matrix.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-dim vectors, got {matrix.shape[1]}")
+        matrix = normalize(matrix)
+        namespace = namespace or ""
+
+        with self._writing():
+            self._reserve(self._count + len(vectors))
+            rows, records = [], []
+            overwritten = False
+            for v in vectors:
+                row = self._id_to_row.get(v["id"])
+                if row is None:
+                    row = self._count
+                    self._count += 1
+                else:
+                    overwritten = True
+                self._set_row(row, v["id"], namespace)
+                rows.append(row)
+                records.append((row, v["id"], namespace, json.dumps(v.get("metadata") or {})))
+            self._vectors[rows] = matrix
+            self._write_codes(rows, matrix)
+            if self.ivf is not None and self.ivf.trained:
+                self.ivf.add(self._vectors, rows)
+            elif overwritten:
+                self._drop_ivf_assignments()
+            self._commit(records)
+            if self._needs_training():
+                self._train_in_background()
+        return {"upserted": len(vectors), "requests": 1, "retries": 0, "failed": []}
+
+    def _needs_training(self) -> bool:
+        if self.ivf is None:
+            return False
+        live = len(self._id_to_row)
+        if not self.ivf.trained:
+            return live >= self.train_size and self.ivf.can_train(live)
+        return bool(self.retrain_growth) and live >= self.retrain_growth * self._ivf_trained
+
+    def _train_in_background(self):
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+
+        def train():
+            try:
+                self.train_index()
+            except Exception:
+                logger.exception("Training the IVF index at %s failed", self.path)
+            finally:
+                self._training = False
+
+        threading.Thread(target=train, name="ivf-train", daemon=True).start()
+
+    def train_index(self) -> bool:
+        """
+        (Re)train the IVF lists on the live rows. Sampling happens under the
+        lock; k-means and assigning the snapshot's rows run outside it, so
+        queries and writes continue meanwhile. Rows written since the
+        snapshot are assigned under the lock, then the new lists are swapped
+        in. Returns False (nothing changed) when a compaction moved the rows
+        in between.
+        """
+        with self._reading():
+            version, vectors = self._version, self._vectors
+            live = np.flatnonzero(self._alive[:self._count])
+            sample = self.ivf.sample(vectors, live)
+        centroids = self.ivf.fit(sample, len(live))
+        labels = self.ivf.assign(vectors, live, centroids)
+
+        with self._writing():
+            if self._compacted > version:
+                return False
+            changed = np.fromiter((row for (row,) in self._db.execute(
+                "SELECT row FROM rows WHERE version > ? AND namespace IS NOT NULL", (version,))), dtype=np.int64)
+            assign = np.full(self._count, -1, dtype=np.int32)
+            assign[live] = labels
+            assign[changed] = self.ivf.assign(self._vectors, changed, centroids)
+            rows = np.flatnonzero(self._alive[:self._count])
+            self.ivf.install(centroids, rows, assign[rows])
+            self._ivf_trained = len(rows)
+            self._commit([], ivf_trained=self._ivf_trained)
+        return True
+
+    def stats(self) -> dict:
+        """
+        Bytes per vector read by a scan and kept on disk, vs. the float32
+        originals alone.
+        """
+        float32_bytes = 4 * self.dimension
+        code_bytes = sum(row_bytes for _, row_bytes in self._code_files()) if self._codes is not None else 0
+        scan_bytes = code_bytes or float32_bytes
+        with self._reading():
+            return {
+                "vectors": len(self._id_to_row),
+                "dtype": self.dtype,
+                "scan_bytes_per_vector": scan_bytes,
+                "disk_bytes_per_vector": float32_bytes + code_bytes,
+                "float32_bytes_per_vector": float32_bytes,
+                "scan_bytes": scan_bytes * self._count,
+            }
+
+    def _score(self, q: np.ndarray, rows) -> np.ndarray:
+        """
+        Cosine scores for rows (an index array or a slice). float16 and int8
+        codes are widened into a small float32 buffer a block at a time, so
+        the scan streams the compact codes and the dot products still run in
+        BLAS (NumPy's float16 and integer matmuls are several times slower);
+        int8 scores are then multiplied by the row scales (the query itself
+        is not quantized).
+        """
+        if self._codes is None:
+            return self._vectors[rows] @ q
+        codes = self._codes[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        buffer = np.empty((min(SCORE_BLOCK, len(codes)), self.dimension), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK):
+            block = buffer[:len(codes[start:start + SCORE_BLOCK])]
+            block[...] = codes[start:start + SCORE_BLOCK]
+            scores[start:start + len(block)] = block @ q
+        if self._scales is not None:
+            scores *= self._scales[rows]
+        return scores
+
+    def _filter_rows(self, namespace, filter: dict) -> np.ndarray:
+        """
+        Live rows in namespace (None: any) whose metadata matches filter.
+        """
+        condition, params = filter_sql(filter)
+        if namespace is None:
+            sql = f"SELECT row FROM rows WHERE namespace IS NOT NULL AND {condition} ORDER BY row"
+        else:
+            sql = f"SELECT row FROM rows WHERE namespace = ? AND {condition} ORDER BY row"
+            params = [namespace, *params]
+        return np.fromiter((row for (row,) in self._db.execute(sql, params)), dtype=np.int64)
+
+    def query(self, vector, top_k: int = 3, namespace: str = None, filter: dict = None, nprobe: int = None):
+        """
+        Returns up to top_k matches as {"id", "score", "metadata"}, best first.
+        namespace=None searches every namespace. nprobe overrides the IVF
+        setting for this call (ignored for flat).
+        """
+        q = normalize(np.asarray(vector, dtype=np.float32))
+        with self._reading():
+            n = self._count
+            if namespace is not None or filter:
+                rows = self._filter_rows(namespace, filter) if filter else self._rows_in(namespace)
+                if self.ivf is not None and self.ivf.trained and len(rows) > self.train_size:
+                    allowed = np.zeros(n, dtype=bool)
+                    allowed[rows] = True
+                    rows = self.ivf.candidates(q, n, nprobe=nprobe)
+                    rows = rows[allowed[rows]]
+                scores = self._score(q, rows)
+            elif self.ivf is not None and self.ivf.trained:
+                rows = self.ivf.candidates(q, n, nprobe=nprobe)
+                rows = rows[self._alive[rows]]
+                scores = self._score(q, rows)
+            else:
+                rows = np.flatnonzero(self._alive[:n])
+                scores = self._score(q, slice(0, n))
+                scores = scores[rows]
+            k = min(top_k, len(rows))
+            if k <= 0:
+                return []
+            if self._codes is not None and self.rescore:
+                # Score the best quantized candidates again with the float32 originals
+                m = min(max(self.rescore, k), len(rows))
+                candidates = np.sort(np.argpartition(-scores, m - 1)[:m])
+                rows = rows[candidates]
+                scores = self._vectors[rows] @ q
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            top_rows = [int(rows[i]) for i in top]
+            found = {
+                row: (vector_id, metadata) for row, vector_id, metadata in self._db.execute(
+                    f"SELECT row, id, metadata FROM rows WHERE row IN ({', '.join('?' * k)})", top_rows)
+            }
+            return [
+                {"id": found[row][0], "score": float(scores[i]), "metadata": json.loads(found[row][1])}
+                for i, row in zip(top, top_rows)
+            ]
+
+    def delete(self, ids, namespace=None):
+        """
+        Tombstone the given ids (unique across namespaces); compacts once dead
+        rows exceed compact_ratio.
+        """
+        with self._writing():
+            records = []
+            for vector_id in ids:
+                row = self._id_to_row.get(vector_id)
+                if row is None:
+                    continue
+                self._set_row(row, vector_id, None)
+                records.append((row, vector_id, None, None))
+            if not records:
+                return
+            self._dead += len(records)
+            self._commit(records)
+            if self._dead > self.compact_ratio * self._count:
+                self.compact()
+
+    def compact(self):
+        """
+        Drop tombstoned rows by sliding live rows down in place.
+        """
+        with self._writing():
+            keep = np.flatnonzero(self._alive[:self._count])
+            # keep[i] >= i, so each block only reads rows not yet overwritten
+            for start in range(0, len(keep), COMPACT_BLOCK):
+                block = keep[start:start + COMPACT_BLOCK]
+                self._vectors[start:start + len(block)] = self._vectors[block]
+                if self._codes is not None:
+                    self._codes[start:start + len(block)] = self._codes[block]
+                    if self._scales is not None:
+                        self._scales[start:start + len(block)] = self._scales[block]
+            if self.ivf is not None:
+                self.ivf.compact(keep)
+            else:
+                self._drop_ivf_assignments()
+            self._flush()
+            self._version += 1
+            with self._db:
+                self._db.execute("DELETE FROM rows WHERE namespace IS NULL")
+                # In ascending order each target row is already free
+                self._db.executemany(
+                    "UPDATE rows SET row = ?, version = ? WHERE row = ?",
+                    ((new, self._version, int(old)) for new, old in enumerate(keep) if new != old),
+                )
+                self._set_info(count=len(keep), version=self._version, compacted=self._version)
+            self._load(self._info())
@@ -0,0 +1,109 @@
+# app/metrics.py
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Time spent per pipeline stage",
+    ["pipeline", "stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+INGEST_DOCUMENTS = Counter("rag_ingest_documents_total", "Ingested documents by outcome", ["status"])
+INGEST_PAGES = Counter("rag_ingest_pages_total", "Pages extracted from uploaded documents")
+INGEST_CHUNKS = Counter("rag_ingest_chunks_total", "Chunks per ingestion outcome", ["outcome"])
+
+# Stage timings of the current request, for the Server-Timing header
+_request_timings: ContextVar[Optional[List[tuple]]] = ContextVar("request_timings", default=None)
+_hooks: List[Callable[[str, str, float], None]] = []
+
+
+def add_hook(hook: Callable[[str, str, float], None]):
+    """
+    Call hook(pipeline, stage, seconds) for every recorded stage.
+    """
+    _hooks.append(hook)
+
+
+def record(stage: str, seconds: float, pipeline: str = "chat"):
+    STAGE_SECONDS.labels(pipeline, stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+    for hook in _hooks:
+        hook(pipeline, stage, seconds)
+
+
+@contextmanager
+def span(stage: str, pipeline: str = "chat"):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start, pipeline)
+
+
+class StageClock:
+    """
+    Accumulates time per stage across interleaved work (e.g. a streaming
+    pipeline) and records each total once, per document.
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.totals = {}
+
+    def add(self, stage: str, seconds: float):
+        self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def iterate(self, iterable, stage: str):
+        """
+        Yield from iterable, charging the time spent producing items to stage.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - start)
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+    def flush(self):
+        for stage, seconds in self.totals.items():
+            record(stage, seconds, self.pipeline)
+        self.totals = {}
+
+
+def start_request_timings() -> List[tuple]:
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing(timings: List[tuple]) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings)
+
+
+def export() -> bytes:
+    """
+    Prometheus text format; aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Index, text
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 
@@ -13,12 +13,18 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    # Embedded in access tokens as "ver"; bumping it revokes every issued token
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     conversations = relationship("Conversation", back_populates="user")
 
 class Conversation(Base):
     __tablename__ = "conversation"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # Backs keyset pagination of /history
+        Index("ix_conversation_user_timestamp_id", "user_id", "timestamp", "id"),
+        {"schema": "public"},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("public.user.id"), nullable=False)
@@ -29,3 +35,57 @@ class Conversation(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="conversations")
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_job"
+    __table_args__ = (
+        # At most one running job per document: two jobs indexing the same
+        # file at once would each replace the other's chunks and orphan vectors
+        Index("ix_ingestion_job_running_document", "user_id", "filename", unique=True,
+              postgresql_where=text("status = 'running'"), sqlite_where=text("status = 'running'")),
+        {"schema": "public"},
+    )
+
+    id = Column(String, primary_key=True)  # uuid4 hex, returned by /upload
+    user_id = Column(Integer, ForeignKey("public.user.id"), nullable=False)
+    batch_id = Column(String, nullable=True, index=True)  # shared by the jobs of one /upload/batch
+    filename = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued", index=True)  # queued | running | done | failed
+    pages_parsed = Column(Integer, nullable=False, default=0)
+    chunks_total = Column(Integer, nullable=False, default=0)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    vectors_upserted = Column(Integer, nullable=False, default=0)
+    chunks_unchanged = Column(Integer, nullable=False, default=0)  # already indexed, not re-embedded
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # heartbeat while running
+
+class Document(Base):
+    """
+    Registry of indexed files: lets re-uploads skip unchanged files/chunks
+    and delete vectors for chunks that disappeared.
+    """
+    __tablename__ = "document"
+    __table_args__ = (UniqueConstraint("user_id", "filename"), {"schema": "public"})
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("public.user.id"), nullable=False)
+    filename = Column(String, nullable=False)
+    file_hash = Column(String, nullable=True)  # sha256 of the last fully indexed version
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan")
+
+class DocumentChunk(Base):
+    __tablename__ = "document_chunk"
+    __table_args__ = {"schema": "public"}
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("public.document.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    chunk_hash = Column(String, nullable=False)  # sha256 of the chunk text
+    vector_id = Column(String, nullable=False)
+
+    document = relationship("Document", back_populates="chunks")
@@ -0,0 +1,87 @@
+# app/passwords.py
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from app.config import settings
+
+_contexts = {}  # rounds -> CryptContext, per process
+
+
+def _context(rounds: int) -> CryptContext:
+    context = _contexts.get(rounds)
+    if context is None:
+        # min == max == default, so any hash at another cost needs an update
+        context = CryptContext(
+            schemes=["bcrypt"], deprecated="auto",
+            bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds,
+        )
+        _contexts[rounds] = context
+    return context
+
+
+def _hash(password: str, rounds: int) -> str:
+    """
+    Runs in a worker process.
+    """
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """
+    Runs in a worker process: (valid, new hash if the stored cost is stale).
+    """
+    return _context(rounds).verify_and_update(password, hashed)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# In-flight plus queued operations; past this we shed load instead of queueing
+_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_PENDING)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Not fork: the app's other threads (ingestion, extraction)
+                # may hold locks that a forked worker would inherit held
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _pool = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_PROCESSES,
+                                            mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise HTTPException(status_code=429, detail="Too many authentication requests, retry shortly",
+                            headers={"Retry-After": "1"})
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), fn, *args)
+    finally:
+        _slots.release()
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password, settings.BCRYPT_ROUNDS)
+
+
+async def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password off the event loop. Returns (valid, new_hash); new_hash
+    is set when the stored hash uses another cost than BCRYPT_ROUNDS and
+    should be saved in place of the old one.
+    """
+    return await _run(_verify_and_update, password, hashed, settings.BCRYPT_ROUNDS)
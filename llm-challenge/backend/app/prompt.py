@@ -0,0 +1,92 @@
+# app/prompt.py
+import re
+from typing import List, Sequence, Tuple
+from app.config import settings
+from app.chunking import count_tokens, split_sentences
+
+WORD_RE = re.compile(r"\w+")
+SHINGLE_SIZE = 3
+
+
+def _shingles(text: str) -> set:
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def dedupe(texts: Sequence[str], threshold: float) -> List[int]:
+    """
+    Indexes of texts to keep, in order: a text is dropped when at least
+    `threshold` of its (or the kept text's) word 3-grams appear in an
+    earlier kept text, which also catches a chunk contained in another.
+    """
+    kept, kept_shingles = [], []
+    for i, text in enumerate(texts):
+        shingles = _shingles(text)
+        duplicate = any(
+            len(shingles & other) / max(min(len(shingles), len(other)), 1) >= threshold
+            for other in kept_shingles
+        )
+        if not duplicate:
+            kept.append(i)
+            kept_shingles.append(shingles)
+    return kept
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """
+    Leading whole sentences of text within max_tokens (at least the first,
+    cut at max_tokens words if it alone is too long).
+    """
+    parts, used = [], 0
+    for sentence, _ in split_sentences(text, 0):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            if not parts:
+                parts.append(" ".join(sentence.split()[:max_tokens]))
+            break
+        parts.append(sentence)
+        used += tokens
+    return " ".join(parts)
+
+
+def summarize_turns(turns: Sequence[Tuple[str, str]], budget: int) -> str:
+    """
+    Extractive summary of (question, answer) turns, oldest first: each answer
+    is cut to its first sentences, and the oldest turns are dropped until the
+    whole summary fits in `budget` tokens.
+    """
+    per_answer = settings.PROMPT_HISTORY_ANSWER_TOKENS
+    lines = [f"User: {question}\nAssistant: {truncate(answer, per_answer)}" for question, answer in turns]
+    while lines and count_tokens("\n".join(lines)) > budget:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def build_prompt(question: str, matches: List[dict], history: Sequence[Tuple[str, str]] = ()) -> Tuple[str, List[dict]]:
+    """
+    Prompt for /chat and the matches whose text made it in.
+
+    Near-duplicate chunks are dropped, then chunks are added in rank order
+    while they fit the context budget: PROMPT_CONTEXT_TOKENS, further limited
+    so that question, history and the LLM_MAX_TOKENS answer fit in
+    LLM_CONTEXT_WINDOW.
+    """
+    summary = summarize_turns(history, settings.PROMPT_HISTORY_TOKENS) if history else ""
+    header = f"Conversation so far:\n{summary}\n\n" if summary else ""
+    tail = f"\n\n{header}User: {question}\nLLM:"
+    available = settings.LLM_CONTEXT_WINDOW - settings.LLM_MAX_TOKENS - count_tokens("Context:\n" + tail)
+    budget = min(settings.PROMPT_CONTEXT_TOKENS, available)
+
+    texts = [m["metadata"]["text"] for m in matches]
+    used, parts, included = 0, [], []
+    for i in dedupe(texts, settings.PROMPT_DEDUP_THRESHOLD):
+        tokens = count_tokens(texts[i])
+        if used + tokens > budget:
+            continue
+        parts.append(texts[i])
+        included.append(matches[i])
+        used += tokens
+    context = "\n".join(parts)
+    return f"Context:\n{context}{tail}", included
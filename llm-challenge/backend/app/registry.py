@@ -0,0 +1,67 @@
+# app/registry.py
+import hashlib
+from datetime import datetime
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import Document, DocumentChunk
+
+HASH_READ_SIZE = 1 << 20
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(HASH_READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def vector_id(document_id: int, chunk_hash: str) -> str:
+    """
+    Content-addressed vector id: an unchanged chunk keeps its id even when
+    edits earlier in the file shift its position.
+    """
+    return f"doc{document_id}_{chunk_hash[:32]}"
+
+
+def get_or_create_document(db: Session, user_id: int, filename: str) -> Document:
+    query = select(Document).where(Document.user_id == user_id, Document.filename == filename)
+    document = db.execute(query).scalars().first()
+    if document is None:
+        document = Document(user_id=user_id, filename=filename)
+        db.add(document)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another session inserted it between our select and insert
+            db.rollback()
+            return db.execute(query).scalars().one()
+        db.refresh(document)
+    return document
+
+
+def indexed_vector_ids(db: Session, document_id: int) -> set:
+    return set(db.execute(
+        select(DocumentChunk.vector_id).where(DocumentChunk.document_id == document_id)
+    ).scalars())
+
+
+def replace_chunks(db: Session, document_id: int, file_hash: str, chunks: list):
+    """
+    Record the fully indexed version: chunks is a list of (chunk_hash, vector_id)
+    in document order. Done in one transaction after all vectors are upserted.
+    """
+    db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+    db.add_all([
+        DocumentChunk(document_id=document_id, chunk_index=i, chunk_hash=chunk_hash, vector_id=vid)
+        for i, (chunk_hash, vid) in enumerate(chunks)
+    ])
+    document = db.get(Document, document_id)
+    document.file_hash = file_hash
+    document.updated_at = datetime.utcnow()
+    db.commit()
@@ -0,0 +1,150 @@
+# app/rerank.py
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+from app.config import settings
+from app.bm25 import tokenize
+from app.chunking import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    """
+    Scores (query, passage) pairs; higher is more relevant.
+    """
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        raise NotImplementedError
+
+
+class LexicalReranker(Reranker):
+    """
+    Cheap scorer: query-term coverage weighted by rarity within the candidate
+    set, with saturating term frequency. Microseconds per passage.
+    """
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return [0.0] * len(texts)
+        passages = [Counter(tokenize(text)) for text in texts]
+        df = Counter(term for passage in passages for term in query_terms if term in passage)
+        n = len(passages)
+        weights = {term: math.log(1 + n / df[term]) for term in df}
+        return [
+            sum(weight * passage[term] / (passage[term] + 1) for term, weight in weights.items() if term in passage)
+            for passage in passages
+        ]
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    sentence-transformers cross-encoder (a small MiniLM runs fine on CPU).
+    """
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        return [float(s) for s in self.model.predict([(query, text) for text in texts], show_progress_bar=False)]
+
+
+def _create_reranker(kind: str) -> Optional[Reranker]:
+    if kind == "none":
+        return None
+    if kind == "lexical":
+        return LexicalReranker()
+    if kind == "cross-encoder":
+        return CrossEncoderReranker(settings.RERANK_MODEL)
+    raise RuntimeError(f"Unknown RERANKER: {kind}")
+
+
+_reranker = None
+_reranker_ready = False
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[Reranker]:
+    """
+    The configured Reranker, created on first use; None when RERANKER=none.
+    """
+    global _reranker, _reranker_ready
+    if not _reranker_ready:
+        with _reranker_lock:
+            if not _reranker_ready:
+                _reranker = _create_reranker(settings.RERANKER)
+                _reranker_ready = True
+    return _reranker
+
+
+async def aget_reranker() -> Optional[Reranker]:
+    """
+    get_reranker() from the event loop: the first call (loading a
+    cross-encoder takes seconds) runs on a worker thread.
+    """
+    if _reranker_ready:
+        return _reranker
+    return await asyncio.to_thread(get_reranker)
+
+
+def _score_batches(reranker: Reranker, query: str, texts: List[str], deadline: float) -> Optional[List[float]]:
+    """
+    Score in batches of RERANK_BATCH_SIZE; None if the deadline passes first.
+    """
+    scores = []
+    size = settings.RERANK_BATCH_SIZE
+    for start in range(0, len(texts), size):
+        if time.monotonic() > deadline:
+            return None
+        scores.extend(reranker.score(query, texts[start:start + size]))
+    return scores
+
+
+def within_budget(matches: List[dict], top_k: int, token_budget: int) -> List[dict]:
+    """
+    Up to top_k matches, in order, whose texts fit in token_budget tokens
+    (the first match is always kept).
+    """
+    kept, used = [], 0
+    for match in matches:
+        if len(kept) == top_k:
+            break
+        tokens = count_tokens(match["metadata"]["text"])
+        if kept and used + tokens > token_budget:
+            continue
+        kept.append(match)
+        used += tokens
+    return kept
+
+
+async def arerank(reranker: Reranker, query: str, candidates: List[dict], top_k: int) -> List[dict]:
+    """
+    Reorder candidates by the reranker and keep the best top_k within
+    RERANK_TOKEN_BUDGET. Past RERANK_TIMEOUT_MS the retrieval order is kept.
+    """
+    if len(candidates) <= 1:
+        return candidates
+    timeout = settings.RERANK_TIMEOUT_MS / 1000
+    texts = [match["metadata"]["text"] for match in candidates]
+    scores = None
+    try:
+        scores = await asyncio.wait_for(
+            asyncio.to_thread(_score_batches, reranker, query, texts, time.monotonic() + timeout),
+            timeout
+        )
+    except asyncio.TimeoutError:
+        pass
+    except Exception:
+        logger.exception("Reranking failed, keeping retrieval order")
+    if scores is None:
+        ranked = candidates
+    else:
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        ranked = [{**candidates[i], "rerank_score": scores[i]} for i in order]
+    return within_budget(ranked, top_k, settings.RERANK_TOKEN_BUDGET)
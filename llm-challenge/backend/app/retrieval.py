@@ -0,0 +1,64 @@
+# app/retrieval.py
+import asyncio
+from typing import List
+from app.config import settings
+from app.vector_db import aquery_matches, user_namespace
+from app.bm25 import get_keyword_index
+from app.rerank import aget_reranker, arerank
+from app.metrics import span
+
+
+def rrf_fuse(ranked_lists: List[List[dict]], weights: List[float], k: int = 60, top_k: int = None) -> List[dict]:
+    """
+    Weighted reciprocal rank fusion: a match scores sum(weight / (k + rank))
+    over the lists it appears in. Raw scores are ignored, so BM25 and cosine
+    scores need no calibration against each other.
+    """
+    scores, matches = {}, {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, match in enumerate(ranked, start=1):
+            scores[match["id"]] = scores.get(match["id"], 0.0) + weight / (k + rank)
+            matches.setdefault(match["id"], match)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [{**matches[match_id], "score": scores[match_id]} for match_id in best]
+
+
+async def acandidates(query: str, query_vector: List[float], top_k: int, user_id: int,
+                      document_ids: List[int] = None) -> List[dict]:
+    """
+    The user's own chunks (optionally only from document_ids): vector search
+    alone, or fused with BM25 when HYBRID_SEARCH is on.
+    """
+    namespace = user_namespace(user_id)
+    filter = {"document_id": {"$in": list(document_ids)}} if document_ids else None
+    index = get_keyword_index()
+    if index is None:
+        return await aquery_matches(query_vector, top_k, namespace, filter)
+    dense, keyword = await asyncio.gather(
+        aquery_matches(query_vector, max(top_k, settings.HYBRID_VECTOR_CANDIDATES), namespace, filter),
+        asyncio.to_thread(index.search, query, max(top_k, settings.HYBRID_KEYWORD_CANDIDATES),
+                          user_id, document_ids)
+    )
+    return rrf_fuse(
+        [dense, keyword],
+        [settings.HYBRID_VECTOR_WEIGHT, settings.HYBRID_KEYWORD_WEIGHT],
+        k=settings.RRF_K,
+        top_k=top_k
+    )
+
+
+async def aretrieve(query: str, query_vector: List[float], user_id: int, document_ids: List[int] = None,
+                    top_k: int = None) -> List[dict]:
+    """
+    Chunks for the chat prompt: [{"id", "score", "metadata"}], best first.
+    With a reranker, RERANK_CANDIDATES are fetched and reranked down to top_k.
+    """
+    top_k = top_k or settings.RETRIEVAL_TOP_K
+    reranker = await aget_reranker()
+    with span("retrieve"):
+        candidates = await acandidates(query, query_vector, top_k if reranker is None else
+                                       max(top_k, settings.RERANK_CANDIDATES), user_id, document_ids)
+    if reranker is None:
+        return candidates
+    with span("rerank"):
+        return await arerank(reranker, query, candidates, top_k)
@@ -0,0 +1,142 @@
+# app/semantic_cache.py
+import threading
+import time
+from typing import List, Optional
+import numpy as np
+from app.config import settings
+from app.local_index import normalize
+from app.vector_db import DIMENSION
+
+
+class SemanticCache:
+    """
+    Cache of /chat answers for near-identical questions.
+
+    An entry is (query embedding, user id, retrieved chunk ids, response). A
+    lookup hits when a live entry of the same user was answered from exactly
+    the same chunk ids, so a changed context never serves a stale answer,
+    AND has cosine similarity >= `threshold` with the new query. Slots are
+    indexed by (user id, chunk ids), so a lookup scores only the entries
+    built from its own context. Entries expire after `ttl_seconds`; the
+    oldest slot is overwritten when full.
+
+    The cache is per process. invalidate_document() drops entries built on a
+    re-ingested document's chunks in this process; other processes still
+    miss as soon as retrieval returns the document's new chunk ids.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 10000,
+                 dimension: int = DIMENSION):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((max_entries, dimension), dtype=np.float32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)  # 0 = empty slot
+        self._entries = [None] * max_entries  # ((user_id, chunk_ids), response)
+        self._by_key = {}  # (user_id, chunk_ids) -> slots, for lookups
+        self._by_chunk = {}  # chunk id -> slots, for invalidation
+        self._next = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unlink(index: dict, key, slot: int):
+        slots = index.get(key)
+        if slots is not None:
+            slots.discard(slot)
+            if not slots:
+                del index[key]
+
+    def _clear(self, slot: int):
+        entry = self._entries[slot]
+        if entry is None:
+            return
+        key = entry[0]
+        self._unlink(self._by_key, key, slot)
+        for chunk_id in key[1]:
+            self._unlink(self._by_chunk, chunk_id, slot)
+        self._entries[slot] = None
+        self._expires[slot] = 0
+
+    def lookup(self, embedding: List[float], chunk_ids: List[str], user_id: int) -> Optional[str]:
+        q = normalize(np.asarray(embedding, dtype=np.float32))
+        key = (user_id, tuple(chunk_ids))
+        now = time.time()
+        with self._lock:
+            best, best_score = None, self.threshold
+            for slot in self._by_key.get(key, ()):
+                if self._expires[slot] <= now:
+                    continue
+                score = float(self._vectors[slot] @ q)  # a row view: nothing is copied
+                if score >= best_score:
+                    best, best_score = slot, score
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._entries[best][1]
+
+    def store(self, embedding: List[float], chunk_ids: List[str], response: str, user_id: int):
+        q = normalize(np.asarray(embedding, dtype=np.float32))
+        key = (user_id, tuple(chunk_ids))
+        with self._lock:
+            slot = self._next
+            self._next = (self._next + 1) % self.max_entries
+            self._clear(slot)
+            self._vectors[slot] = q
+            self._expires[slot] = time.time() + self.ttl_seconds
+            self._entries[slot] = (key, response)
+            self._by_key.setdefault(key, set()).add(slot)
+            for chunk_id in key[1]:
+                self._by_chunk.setdefault(chunk_id, set()).add(slot)
+
+    def invalidate_chunks(self, chunk_ids):
+        with self._lock:
+            slots = set()
+            for chunk_id in chunk_ids:
+                slots |= self._by_chunk.get(chunk_id, set())
+            for slot in slots:
+                self._clear(slot)
+            self.invalidations += len(slots)
+
+    def invalidate_document(self, document_id: int):
+        """
+        Drop entries answered from any chunk of the document (ids "doc<id>_...").
+        """
+        prefix = f"doc{document_id}_"
+        with self._lock:
+            chunk_ids = [c for c in self._by_chunk if c.startswith(prefix)]
+        self.invalidate_chunks(chunk_ids)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "entries": int(np.count_nonzero(self._expires > time.time())),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    The shared SemanticCache, or None when SEMANTIC_CACHE_ENABLED is false.
+    """
+    global _cache
+    if _cache is None and settings.SEMANTIC_CACHE_ENABLED:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                    ttl_seconds=settings.SEMANTIC_CACHE_TTL,
+                    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                )
+    return _cache
@@ -0,0 +1,104 @@
+# app/user_cache.py
+import threading
+import time
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models import User
+
+
+class CurrentUser:
+    """
+    Detached snapshot of the authenticated user, safe to share between requests.
+    """
+    __slots__ = ("id", "username", "email", "token_version")
+
+    def __init__(self, id: int, username: str, email: str, token_version: int):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.token_version = token_version
+
+    @classmethod
+    def from_model(cls, user: User) -> "CurrentUser":
+        return cls(user.id, user.username, user.email, user.token_version or 0)
+
+
+class UserCache:
+    """
+    In-process TTL cache of CurrentUser by id.
+
+    Entries are dropped by invalidate() on password change in this process;
+    other processes notice within `ttl_seconds`, which bounds how long a
+    revoked token or deleted user can still be served from cache.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # id -> (CurrentUser, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user: CurrentUser):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first, then the oldest insertion
+                now = time.monotonic()
+                for user_id in [k for k, (_, exp) in self._entries.items() if exp < now]:
+                    del self._entries[user_id]
+                if len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[user.id] = (user, time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+user_cache = UserCache(ttl_seconds=settings.USER_CACHE_TTL, max_entries=settings.USER_CACHE_MAX_ENTRIES)
+
+
+async def resolve_user(payload: dict, db: AsyncSession) -> CurrentUser:
+    """
+    Map a decoded token to its user. Tokens carry "uid" and "ver" (the user's
+    token_version at issue time); a warm cache answers without touching the
+    database. A token newer than the cached user was issued after a password
+    change made in another process: the entry is stale, so the user is read
+    again, and only a token older than the current version is revoked.
+    Tokens issued before "uid" existed fall back to a username lookup.
+    """
+    user_id = payload.get("uid")
+    version = payload.get("ver", 0)
+    user = user_cache.get(user_id) if user_id is not None else None
+    if user is not None and version > user.token_version:
+        user_cache.invalidate(user_id)
+        user = None
+    if user is None:
+        if user_id is not None:
+            model = await db.get(User, user_id)
+        else:
+            username = payload.get("sub")
+            if not username:
+                raise HTTPException(status_code=401, detail="Invalid token payload")
+            result = await db.execute(select(User).where(User.username == username))
+            model = result.scalars().first()
+        if not model:
+            raise HTTPException(status_code=401, detail="User not found")
+        user = CurrentUser.from_model(model)
+        user_cache.put(user)
+    if user.token_version != version:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return user
@@ -1,56 +1,256 @@
 # app/vector_db.py
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
-import pinecone
+from app.config import settings
 
-# Load .env
-BASE_DIR = Path(__file__).resolve().parent.parent
-env_path = BASE_DIR / ".env"
-load_dotenv(dotenv_path=env_path)
-
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_ENV = os.getenv("PINECONE_ENV", "us-east-1-aws")
-if not PINECONE_API_KEY:
-    raise RuntimeError("PINECONE_API_KEY not set in .env")
-
-# Initialize Pinecone client
-pc = Pinecone(api_key=PINECONE_API_KEY)
+logger = logging.getLogger(__name__)
 
 INDEX_NAME = "ragworks-index"
 DIMENSION = 1024
 
-# Create index if not exists
-if INDEX_NAME not in [i.name for i in pc.list_indexes()]:
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=DIMENSION,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
+# Estimated request bytes per vector component: a float written out in JSON
+# ("-0.012345678901234567, ") vs a packed protobuf float
+JSON_FLOAT_BYTES = 22
+GRPC_FLOAT_BYTES = 4
+UPSERT_BACKOFF_SECONDS = 0.5
+
+
+def user_namespace(user_id: int) -> str:
+    """
+    Each user's chunks live in their own namespace, so a query only scores
+    that user's corpus.
+    """
+    return f"user-{user_id}"
+
+
+class VectorStore:
+    """
+    Interface implemented by every vector backend.
+    Matches are dicts: {"id": str, "score": float, "metadata": dict}.
+    `filter` uses Pinecone's syntax: {"field": value} or {"field": {"$in": [...]}}.
+    """
+
+    def upsert(self, vectors, namespace=None):
+        """
+        Returns a summary: {"upserted": int, "requests": int, "retries": int, "failed": [ids]}.
+        """
+        raise NotImplementedError
+
+    def query(self, vector, top_k=3, namespace=None, filter=None):
+        raise NotImplementedError
+
+    def delete(self, ids, namespace=None):
+        raise NotImplementedError
+
+
+def upsert_batches(vectors, max_vectors: int, max_bytes: int, float_bytes: int):
+    """
+    Split vectors, in order, into batches of at most max_vectors and about
+    max_bytes of request payload (a vector too large on its own gets its own
+    batch and the server decides).
+    """
+    batch, size = [], 0
+    for vector in vectors:
+        vector_bytes = (len(vector["id"]) + float_bytes * len(vector["values"])
+                        + len(json.dumps(vector.get("metadata") or {})))
+        if batch and (len(batch) >= max_vectors or size + vector_bytes > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(vector)
+        size += vector_bytes
+    if batch:
+        yield batch
+
+
+def _merge_summaries(summaries) -> dict:
+    merged = {"upserted": 0, "requests": 0, "retries": 0, "failed": []}
+    for summary in summaries:
+        for key in ("upserted", "requests", "retries", "failed"):
+            merged[key] += summary[key]
+        merged["error"] = summary.get("error") or merged.get("error")
+    return merged
+
+
+class PineconeStore(VectorStore):
+    def __init__(self):
+        if settings.PINECONE_GRPC:
+            try:
+                from pinecone.grpc import PineconeGRPC as Pinecone
+            except ImportError:
+                raise RuntimeError('PINECONE_GRPC=true needs pip install "pinecone-client[grpc]"')
+        else:
+            from pinecone import Pinecone
+        from pinecone import ServerlessSpec
+
+        if not settings.PINECONE_API_KEY:
+            raise RuntimeError("PINECONE_API_KEY not set in .env")
+        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+
+        # Create index if not exists
+        if INDEX_NAME not in [i.name for i in pc.list_indexes()]:
+            pc.create_index(
+                name=INDEX_NAME,
+                dimension=DIMENSION,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1")
+            )
+        self.index = pc.Index(INDEX_NAME)
+        self.float_bytes = GRPC_FLOAT_BYTES if settings.PINECONE_GRPC else JSON_FLOAT_BYTES
+        # What an upsert request can fail with; anything else is a bug and propagates
+        import pinecone
+        import urllib3
+        request_errors = [pinecone.exceptions.PineconeException, urllib3.exceptions.HTTPError, OSError]
+        if settings.PINECONE_GRPC:
+            import grpc
+            request_errors.append(grpc.RpcError)
+        self._request_errors = tuple(request_errors)
+        # Shared by all callers, so concurrent uploads don't multiply the request rate
+        self._upsert_pool = ThreadPoolExecutor(settings.PINECONE_UPSERT_CONCURRENCY,
+                                               thread_name_prefix="pinecone-upsert")
+
+    def upsert(self, vectors, namespace=None):
+        """
+        Send vectors in batches under the request limits, up to
+        PINECONE_UPSERT_CONCURRENCY at a time, each batch retried on its own.
+        If some vectors still fail, the rest stay written and a 400 is raised;
+        vector ids are content-addressed, so uploading the file again repairs it.
+        """
+        batches = list(upsert_batches(vectors, settings.PINECONE_UPSERT_MAX_VECTORS,
+                                      settings.PINECONE_UPSERT_MAX_BYTES, self.float_bytes))
+        if len(batches) == 1:
+            summary = self._send(batches[0], namespace or "")
+        else:
+            summary = _merge_summaries(self._upsert_pool.map(lambda b: self._send(b, namespace or ""), batches))
+        if summary["failed"]:
+            raise HTTPException(status_code=400, detail=(
+                f"Pinecone upsert error: {len(summary['failed'])} of {len(vectors)} vectors failed: {summary['error']}"
+            ))
+        summary.pop("error", None)
+        return summary
+
+    def _send(self, batch, namespace: str) -> dict:
+        """
+        One upsert request. Pinecone, throttling, server and network errors
+        are retried with exponential backoff; a batch rejected as invalid or too large
+        (400, 413) is split in half and each half sent again, down to the
+        offending vectors. Other client errors (auth, missing index) fail at once.
+        """
+        retries = 0
+        while True:
+            try:
+                self.index.upsert(vectors=batch, namespace=namespace)
+                return {"upserted": len(batch), "requests": retries + 1, "retries": retries, "failed": []}
+            except self._request_errors as e:
+                status = getattr(e, "status", None) or getattr(e, "status_code", None)
+                rejected = isinstance(status, int) and 400 <= status < 500 and status != 429
+                if status in (400, 413) and len(batch) > 1:
+                    half = len(batch) // 2
+                    summary = _merge_summaries([self._send(batch[:half], namespace),
+                                                self._send(batch[half:], namespace)])
+                    summary["requests"] += retries + 1
+                    summary["retries"] += retries + 1
+                    return summary
+                if rejected or retries >= settings.PINECONE_UPSERT_RETRIES:
+                    logger.warning("Pinecone upsert of %d vectors failed: %s", len(batch), e)
+                    return {"upserted": 0, "requests": retries + 1, "retries": retries,
+                            "failed": [v["id"] for v in batch], "error": str(e)}
+                time.sleep(UPSERT_BACKOFF_SECONDS * 2 ** retries)
+                retries += 1
 
-# Connect to index
-index = pc.Index(INDEX_NAME)
+    def query(self, vector, top_k=3, namespace=None, filter=None):
+        import pinecone
+        try:
+            response = self.index.query(vector=vector, top_k=top_k, include_metadata=True,
+                                        namespace=namespace or "", filter=filter)
+        except pinecone.exceptions.PineconeException as e:
+            raise HTTPException(status_code=400, detail=f"Pinecone query error: {e}")
+        return [{"id": m.id, "score": m.score, "metadata": m.metadata} for m in response.matches]
 
-def upsert_vectors(vectors):
+    def delete(self, ids, namespace=None):
+        import pinecone
+        try:
+            self.index.delete(ids=list(ids), namespace=namespace or "")
+        except pinecone.exceptions.PineconeException as e:
+            raise HTTPException(status_code=400, detail=f"Pinecone delete error: {e}")
+
+
+def _create_store(backend: str) -> VectorStore:
+    if backend == "pinecone":
+        return PineconeStore()
+    if backend == "local":
+        from app.local_index import LocalVectorStore
+        return LocalVectorStore(
+            settings.VECTOR_INDEX_DIR,
+            DIMENSION,
+            compact_ratio=settings.VECTOR_COMPACT_RATIO,
+            index=settings.VECTOR_INDEX,
+            nlist=settings.IVF_NLIST,
+            nprobe=settings.IVF_NPROBE,
+            train_size=settings.IVF_TRAIN_SIZE,
+            retrain_growth=settings.IVF_RETRAIN_GROWTH,
+            dtype=settings.VECTOR_DTYPE,
+            rescore=settings.VECTOR_RESCORE,
+        )
+    raise RuntimeError(f"Unknown VECTOR_BACKEND: {backend}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> VectorStore:
+    """
+    Returns the configured vector store, creating it on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _create_store(settings.VECTOR_BACKEND)
+    return _store
+
+
+def upsert_vectors(vectors, namespace=None) -> dict:
     """
     vectors: list of dicts like:
     {"id": "file_chunk_1", "values": [...], "metadata": {"text": "chunk text"}}
+    Returns the store's summary (upserted, requests, retries, failed ids).
     """
-    try:
-        index.upsert(vectors=vectors)
-    except pinecone.exceptions.PineconeApiException as e:
-        raise HTTPException(status_code=400, detail=f"Pinecone upsert error: {e}")
+    return get_store().upsert(vectors, namespace=namespace)
 
-def query_vectors(query_vector, top_k=3):
+
+def query_matches(query_vector, top_k=3, namespace=None, filter=None):
+    """
+    Returns the top_k matches (id, score, metadata) most similar to the query_vector
+    """
+    return get_store().query(query_vector, top_k=top_k, namespace=namespace, filter=filter)
+
+
+def query_vectors(query_vector, top_k=3, namespace=None, filter=None):
     """
     Returns a list of the top_k texts most similar to the query_vector
     """
-    try:
-        response = index.query(vector=query_vector, top_k=top_k, include_metadata=True)
-        results = [match.metadata['text'] for match in response.matches]
-        return results
-    except pinecone.exceptions.PineconeApiException as e:
-        raise HTTPException(status_code=400, detail=f"Pinecone query error: {e}")
+    return [m["metadata"]["text"] for m in query_matches(query_vector, top_k, namespace, filter)]
+
+
+async def aquery_matches(query_vector, top_k=3, namespace=None, filter=None):
+    """
+    query_matches() on a worker thread so the event loop isn't blocked
+    """
+    return await asyncio.to_thread(query_matches, query_vector, top_k, namespace, filter)
+
+
+async def aquery_vectors(query_vector, top_k=3, namespace=None, filter=None):
+    """
+    query_vectors() on a worker thread so the event loop isn't blocked
+    """
+    return await asyncio.to_thread(query_vectors, query_vector, top_k, namespace, filter)
+
+
+def delete_vectors(ids, namespace=None):
+    get_store().delete(ids, namespace=namespace)
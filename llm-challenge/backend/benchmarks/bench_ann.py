@@ -0,0 +1,76 @@
+"""
+Recall@k vs. latency of the IVF index against exact (flat) search.
+
+Run from llm-challenge/backend:
+    python -m benchmarks.bench_ann --vectors 200000 --dim 1024 --nlist 1024
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from app.local_index import LocalVectorStore
+
+
+def clustered_vectors(n, dim, clusters, seed=0):
+    """
+    Synthetic embeddings: points scattered around random cluster centres,
+    which is closer to real document embeddings than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return centres[labels] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def load(store, data, batch=5000):
+    for start in range(0, len(data), batch):
+        store.upsert([
+            {"id": str(i), "values": data[i], "metadata": {}}
+            for i in range(start, min(start + batch, len(data)))
+        ])
+
+
+def timed_queries(store, queries, k, **kwargs):
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        results.append([m["id"] for m in store.query(q, top_k=k, **kwargs)])
+    elapsed = time.perf_counter() - start
+    return results, 1000 * elapsed / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    data = clustered_vectors(args.vectors, args.dim, clusters=max(args.nlist // 2, 1))
+    queries = clustered_vectors(args.queries, args.dim, clusters=max(args.nlist // 2, 1), seed=1)
+
+    with tempfile.TemporaryDirectory() as flat_dir, tempfile.TemporaryDirectory() as ivf_dir:
+        flat = LocalVectorStore(flat_dir, args.dim)
+        load(flat, data)
+        ivf = LocalVectorStore(ivf_dir, args.dim, index="ivf", nlist=args.nlist,
+                               train_size=args.vectors + 1)
+        load(ivf, data)
+        start = time.perf_counter()
+        ivf.train_index()
+        print(f"vectors={args.vectors} dim={args.dim} nlist={args.nlist} "
+              f"train={time.perf_counter() - start:.1f}s")
+
+        exact, exact_ms = timed_queries(flat, queries, args.k)
+        print(f"{'index':<12}{'recall@' + str(args.k):>12}{'ms/query':>12}")
+        print(f"{'flat':<12}{1.0:>12.3f}{exact_ms:>12.2f}")
+        for nprobe in args.nprobe:
+            approx, ms = timed_queries(ivf, queries, args.k, nprobe=nprobe)
+            recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact)])
+            print(f"{'ivf/' + str(nprobe):<12}{recall:>12.3f}{ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Per-request cost of authenticating a bearer token: JWT decode plus a user
+lookup on every request (cache disabled) versus a warm user cache.
+
+Defaults to a throwaway SQLite database, which understates the saving: a
+Postgres round trip is usually far slower than a local SQLite read. Point
+--database-url at Postgres (postgresql+asyncpg://...) for real numbers; the
+"user" table must exist there.
+
+Run from llm-challenge/backend:
+    python -m benchmarks.bench_auth --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+import jwt
+from sqlalchemy import delete, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.config import settings
+from app.models import Base, User
+from app.user_cache import resolve_user, user_cache
+
+
+def sqlite_engine(tmpdir):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmpdir}/main.db")
+    public = os.path.join(tmpdir, "public.db")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def attach_public(dbapi_connection, _):
+        # Models live in the "public" schema
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"ATTACH DATABASE '{public}' AS public")
+        cursor.close()
+
+    return engine
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_async_engine(args.database_url) if args.database_url else sqlite_engine(tmpdir)
+        Session = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[User.__table__])
+        async with Session() as db:
+            user = User(username=f"bench-{time.time_ns()}", email=f"{time.time_ns()}@bench.test",
+                        hashed_password="x")
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+        token = jwt.encode({"sub": user.username, "uid": user.id, "ver": 0,
+                            "exp": datetime.utcnow() + timedelta(minutes=30)},
+                           settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+        async def authenticate():
+            start = time.perf_counter()
+            async with Session() as db:
+                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+                await resolve_user(payload, db)
+            return time.perf_counter() - start
+
+        results = {}
+        for mode in ("uncached", "cached"):
+            await authenticate()  # warm up the pool (and the cache)
+            samples = []
+            for _ in range(args.requests):
+                if mode == "uncached":
+                    user_cache.invalidate(user.id)
+                samples.append(await authenticate())
+            results[mode] = samples
+
+        async with Session() as db:
+            await db.execute(delete(User).where(User.id == user.id))
+            await db.commit()
+        await engine.dispose()
+
+    print(f"{'mode':<10}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, samples in results.items():
+        samples.sort()
+        print(f"{mode:<10}{statistics.mean(samples) * 1e3:>10.3f}{samples[len(samples) // 2] * 1e3:>10.3f}"
+              f"{samples[int(len(samples) * 0.99)] * 1e3:>10.3f}")
+    saving = statistics.mean(results["uncached"]) - statistics.mean(results["cached"])
+    print(f"saving per request: {saving * 1e3:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--database-url", default=None)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
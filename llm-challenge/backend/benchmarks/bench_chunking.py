@@ -0,0 +1,73 @@
+"""
+Chunker throughput (chunks/sec, MB/sec) on a large synthetic document,
+compared with the old fixed 500-character slicing.
+
+Run from llm-challenge/backend:
+    python -m benchmarks.bench_chunking --mb 50
+"""
+import argparse
+import random
+import time
+from app.chunking import chunk_records, count_tokens
+
+WORDS = ("the model retrieval index vector query document section result offer "
+         "candidate resume experience python latency budget token chunk page").split()
+
+
+def synthetic_pages(megabytes, page_chars=3000, seed=0):
+    """
+    Page records with headings, paragraphs and wrapped lines, like PDF text.
+    """
+    rng = random.Random(seed)
+    total = int(megabytes * 1_000_000)
+    produced, page = 0, 1
+    while produced < total:
+        lines = []
+        size = 0
+        while size < page_chars:
+            if rng.random() < 0.05:
+                lines.append(f"{rng.randint(1, 9)}.{rng.randint(1, 9)} {rng.choice(WORDS).title()} Section")
+                lines.append("")
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+            lines.append(sentence)
+            if rng.random() < 0.2:
+                lines.append("")
+            size += len(sentence) + 1
+        text = "\n".join(lines) + "\n"
+        produced += len(text)
+        yield {"page": page, "text": text}
+        page += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=float, default=20)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--overlap", type=int, default=32)
+    args = parser.parse_args()
+
+    pages = list(synthetic_pages(args.mb))
+    size_mb = sum(len(p["text"]) for p in pages) / 1e6
+
+    start = time.perf_counter()
+    text = "".join(p["text"] for p in pages)
+    fixed = [text[i:i + 500] for i in range(0, len(text), 500)]
+    fixed_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunks = list(chunk_records(pages, source="bench", max_tokens=args.max_tokens,
+                                overlap_tokens=args.overlap))
+    chunker_s = time.perf_counter() - start
+
+    fixed_tokens = sum(count_tokens(c) for c in fixed[:1000]) / min(len(fixed), 1000)
+    print(f"document: {size_mb:.1f} MB, {len(pages)} pages")
+    print(f"{'chunker':<14}{'chunks':>10}{'chunks/s':>12}{'MB/s':>10}{'avg tokens':>12}")
+    print(f"{'fixed-500':<14}{len(fixed):>10}{len(fixed) / fixed_s:>12.0f}"
+          f"{size_mb / fixed_s:>10.1f}{fixed_tokens:>12.1f}")
+    avg_tokens = sum(c["tokens"] for c in chunks) / len(chunks)
+    print(f"{'structure':<14}{len(chunks):>10}{len(chunks) / chunker_s:>12.0f}"
+          f"{size_mb / chunker_s:>10.1f}{avg_tokens:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Login load test: concurrent password verifications through app/passwords.py
+(process pool, bounded queue) versus verifying inline on the event loop, as
+the old synchronous handlers effectively did. Reports logins/s, logins/s per
+core and how many attempts were shed with 429 (and retried).
+
+Run from llm-challenge/backend:
+    python -m benchmarks.bench_login --logins 200 --concurrency 64 --rounds 10
+"""
+import argparse
+import asyncio
+import os
+import time
+from fastapi import HTTPException
+from app import passwords
+from app.config import settings
+
+
+async def inline(password, hashed):
+    return passwords._verify_and_update(password, hashed, settings.BCRYPT_ROUNDS)
+
+
+async def load(verify, hashed, logins, concurrency):
+    queue = asyncio.Queue()
+    for _ in range(logins):
+        queue.put_nowait(None)
+    ok = shed = 0
+    latencies = []
+
+    async def client():
+        nonlocal ok, shed
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                valid, _ = await verify("correct horse", hashed)
+                assert valid
+                ok += 1
+                latencies.append(time.perf_counter() - start)
+            except HTTPException as e:
+                assert e.status_code == 429
+                shed += 1
+                queue.put_nowait(None)  # honour Retry-After (shortened) and try again
+                await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    return ok, shed, elapsed, p95
+
+
+async def run(args):
+    settings.BCRYPT_ROUNDS = args.rounds
+    hashed = passwords._hash("correct horse", args.rounds)
+    await passwords.verify_password("correct horse", hashed)  # start the pool
+    cores = min(settings.PASSWORD_HASH_PROCESSES, os.cpu_count() or 1)
+    print(f"bcrypt rounds={args.rounds}, pool processes={settings.PASSWORD_HASH_PROCESSES}, "
+          f"cores={os.cpu_count()}, max pending={settings.PASSWORD_HASH_MAX_PENDING}")
+    print(f"{'mode':<8}{'ok':>6}{'429':>6}{'logins/s':>10}{'per core':>10}{'p95 ms':>10}")
+    for mode, verify, used_cores in (("inline", inline, 1), ("pool", passwords.verify_password, cores)):
+        ok, shed, elapsed, p95 = await load(verify, hashed, args.logins, args.concurrency)
+        rate = ok / elapsed
+        print(f"{mode:<8}{ok:>6}{shed:>6}{rate:>10.1f}{rate / used_cores:>10.1f}{p95 * 1e3:>10.1f}")
+    passwords.shutdown_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=settings.BCRYPT_ROUNDS)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Memory vs. recall of quantized local vector storage (float16 / int8, with and
+without float32 rescoring) against exact float32 search.
+
+Run from llm-challenge/backend:
+    python -m benchmarks.bench_quantization --vectors 200000 --dim 1024 --rescore 0 32 128
+"""
+import argparse
+import tempfile
+import numpy as np
+from app.local_index import LocalVectorStore
+from benchmarks.bench_ann import clustered_vectors, load, timed_queries
+
+
+def recall(approx, exact) -> float:
+    return float(np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=128)
+    parser.add_argument("--dtypes", nargs="+", default=["float16", "int8"])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 32, 128])
+    args = parser.parse_args()
+
+    data = clustered_vectors(args.vectors, args.dim, clusters=args.clusters)
+    queries = clustered_vectors(args.queries, args.dim, clusters=args.clusters, seed=1)
+
+    with tempfile.TemporaryDirectory() as flat_dir:
+        flat = LocalVectorStore(flat_dir, args.dim)
+        load(flat, data)
+        exact, exact_ms = timed_queries(flat, queries, args.k)
+        base = flat.stats()["scan_bytes"]
+        print(f"vectors={args.vectors} dim={args.dim} k={args.k}")
+        print(f"{'storage':<18}{'scan MB':>10}{'saved':>8}{'disk':>7}{'recall@' + str(args.k):>11}{'ms/query':>10}")
+        print(f"{'float32':<18}{base / 1e6:>10.1f}{0:>8.0%}{1.0:>6.2f}x{1.0:>11.3f}{exact_ms:>10.2f}")
+
+        for dtype in args.dtypes:
+            with tempfile.TemporaryDirectory() as quantized_dir:
+                store = LocalVectorStore(quantized_dir, args.dim, dtype=dtype)
+                load(store, data)
+                stats = store.stats()
+                scan = stats["scan_bytes"]
+                disk = stats["disk_bytes_per_vector"] / stats["float32_bytes_per_vector"]
+                for rescore in args.rescore:
+                    store.rescore = rescore
+                    approx, ms = timed_queries(store, queries, args.k)
+                    label = f"{dtype}" + (f"+rescore{rescore}" if rescore else "")
+                    print(f"{label:<18}{scan / 1e6:>10.1f}{1 - scan / base:>8.0%}{disk:>6.2f}x"
+                          f"{recall(approx, exact):>11.3f}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Synthetic upload corpora: PDF, DOCX and TXT files of controlled size, with
+the same seeded text as bench_chunking (headings, paragraphs, wrapped lines).
+
+Run from llm-challenge/backend:
+    python -m benchmarks.corpus --out /tmp/corpus --kinds pdf,docx,txt --files 2 --mb 1
+"""
+import argparse
+import os
+import textwrap
+from benchmarks.bench_chunking import synthetic_pages
+
+PDF_LINE_CHARS = 95
+PDF_LINES_PER_PAGE = 60
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages):
+    """
+    Minimal text-only PDF (Helvetica, one content stream per page) that
+    PyPDF2 can extract; no external dependency.
+    """
+    lines = []
+    for page in pages:
+        for line in page["text"].split("\n"):
+            lines.extend(textwrap.wrap(line, PDF_LINE_CHARS) or [""])
+    page_lines = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]  # 1 catalog, 2 pages, 3 font
+    page_ids = []
+    for chunk in page_lines:
+        body = "BT /F1 9 Tf 12 TL 40 800 Td\n" + "".join(f"({_pdf_escape(l)}) Tj T*\n" for l in chunk) + "ET"
+        stream = body.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, obj in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + obj + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def write_docx(path: str, pages):
+    import docx
+    document = docx.Document()
+    for page in pages:
+        for paragraph in page["text"].split("\n\n"):
+            if paragraph.strip():
+                document.add_paragraph(paragraph.replace("\n", " "))
+    document.save(path)
+
+
+def write_txt(path: str, pages):
+    with open(path, "w", encoding="utf-8") as f:
+        for page in pages:
+            f.write(page["text"])
+
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx, "txt": write_txt}
+
+
+def generate(out_dir: str, kinds=("pdf", "docx", "txt"), files: int = 1, megabytes: float = 1.0, seed: int = 0):
+    """
+    Write `files` files of about `megabytes` of text per kind; returns their paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for kind in kinds:
+        for i in range(files):
+            path = os.path.join(out_dir, f"{kind}_{i}.{kind}")
+            WRITERS[kind](path, synthetic_pages(megabytes, seed=seed + i))
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--kinds", default="pdf,docx,txt")
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--mb", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for path in generate(args.out, args.kinds.split(","), args.files, args.mb, args.seed):
+        print(f"{os.path.getsize(path) / 1e6:8.2f} MB  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Fake OpenAI-compatible chat completions server for local runs.
+
+    uvicorn benchmarks.fake_llm:app --port 9000
+    LLM_API_URL=http://127.0.0.1:9000/v1/chat/completions uvicorn app.main:app
+
+Env: FAKE_LLM_TOKENS (tokens per answer), FAKE_LLM_TOKEN_DELAY (seconds per token),
+FAKE_LLM_LATENCY (seconds before the first token).
+"""
+import asyncio
+import json
+import os
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+TOKENS = int(os.getenv("FAKE_LLM_TOKENS", "64"))
+TOKEN_DELAY = float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.01"))
+LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+
+app = FastAPI(title="Fake LLM")
+
+
+def chunk(model, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+@app.post("/v1/chat/completions")
+async def completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+    tokens = min(TOKENS, body.get("max_tokens") or TOKENS)
+    words = [f"tok{i} " for i in range(tokens)]
+    await asyncio.sleep(LATENCY)
+
+    if not body.get("stream"):
+        await asyncio.sleep(TOKEN_DELAY * tokens)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(words)},
+                "finish_reason": "stop",
+            }],
+        }
+
+    async def events():
+        yield f"data: {json.dumps(chunk(model, {'role': 'assistant'}))}\n\n"
+        for word in words:
+            await asyncio.sleep(TOKEN_DELAY)
+            yield f"data: {json.dumps(chunk(model, {'content': word}))}\n\n"
+        yield f"data: {json.dumps(chunk(model, {}, finish_reason='stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
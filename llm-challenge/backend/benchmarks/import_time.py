@@ -0,0 +1,59 @@
+"""
+Import-time budget for the app package. Imports app.main in a fresh
+interpreter under `python -X importtime`, prints the slowest modules and
+exits non-zero when the total exceeds the budget, so it can gate CI.
+
+Run from llm-challenge/backend:
+    python -m benchmarks.import_time --budget-ms 1500
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def measure(module: str, runs: int):
+    """
+    Best-of-`runs` import of `module`: (total µs, [(cumulative µs, self µs, name)]).
+    """
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, env={**os.environ, "PYTHONPATH": os.getcwd()},
+        )
+        if result.returncode != 0:
+            sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+        modules = []
+        for line in result.stderr.splitlines():
+            match = LINE_RE.match(line)
+            if match:
+                modules.append((int(match.group(2)), int(match.group(1)), match.group(4)))
+        total = sum(self_us for _, self_us, _ in modules)
+        if best is None or total < best[0]:
+            best = (total, modules)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    total, modules = measure(args.module, args.runs)
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for cumulative, self_us, name in sorted(modules, reverse=True)[:args.top]:
+        print(f"{cumulative / 1e3:>14.1f}{self_us / 1e3:>10.1f}  {name}")
+    print(f"total import time of {args.module}: {total / 1e3:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if total / 1e3 > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
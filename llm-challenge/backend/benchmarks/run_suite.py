@@ -0,0 +1,311 @@
+"""
+End-to-end benchmark: boots the real app (uvicorn subprocess) against local
+stand-ins and reports ingest throughput, chat latency percentiles and peak
+memory as JSON.
+
+Stand-ins: benchmarks.fake_llm for the LLM, the deterministic placeholder
+embedding, VECTOR_BACKEND=local and a SQLite database (or --database-url,
+e.g. a scratch Postgres). Everything else lives in a temporary directory.
+
+Run from llm-challenge/backend:
+    python -m benchmarks.run_suite --files 2 --mb 1 --chat-requests 200 --output results.json
+    python -m benchmarks.run_suite ... --baseline results.json   # compare with an earlier run
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import httpx
+from benchmarks.corpus import generate
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(module: str, port: int, env: dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "wb")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            sys.exit(f"server exited with {process.returncode} before serving {url}")
+        try:
+            httpx.get(url, timeout=1)
+            return time.perf_counter() - start
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    sys.exit(f"{url} not ready after {timeout}s")
+
+
+def memory_kb(pid: int) -> dict:
+    """
+    Peak (VmHWM) and current (VmRSS) resident memory of a Linux process.
+    """
+    result = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmHWM", "VmRSS")):
+                    key, value = line.split(":")
+                    result[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return result
+
+
+def percentiles(samples) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    pick = lambda p: samples[min(len(samples) - 1, int(p * len(samples)))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": sum(samples) / len(samples),
+            "max": samples[-1], "count": len(samples)}
+
+
+def stage_means(metrics_text: str) -> dict:
+    """
+    Mean seconds per (pipeline, stage) from the app's /metrics histograms.
+    """
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        for suffix, target in (("_sum", sums), ("_count", counts)):
+            prefix = f"rag_stage_seconds{suffix}{{"
+            if line.startswith(prefix):
+                labels, value = line[len(prefix):].split("} ")
+                fields = dict(part.split("=") for part in labels.split(","))
+                target[f"{fields['pipeline'].strip(chr(34))}.{fields['stage'].strip(chr(34))}"] = float(value)
+    return {key: sums[key] / counts[key] for key in sums if counts.get(key)}
+
+
+async def ingest(client: httpx.AsyncClient, headers: dict, paths, poll: float, batch: bool) -> dict:
+    """
+    Upload paths one request per file, or all at once through /upload/batch,
+    and wait for every job to finish.
+    """
+    start = time.perf_counter()
+    jobs = {}
+    if batch:
+        handles = [open(path, "rb") for path in paths]
+        try:
+            response = await client.post("/upload/batch", headers=headers,
+                                         files=[("files", (os.path.basename(h.name), h)) for h in handles])
+        finally:
+            for handle in handles:
+                handle.close()
+        response.raise_for_status()
+        batch_id = response.json()["batch_id"]
+        while not jobs:
+            await asyncio.sleep(poll)
+            status = (await client.get(f"/upload/batch/{batch_id}", headers=headers)).json()
+            if all(job["status"] in ("done", "failed") for job in status["jobs"]):
+                jobs = {job["job_id"]: job for job in status["jobs"]}
+    else:
+        job_ids = []
+        for path in paths:
+            with open(path, "rb") as f:
+                response = await client.post("/upload", headers=headers, files={"file": (os.path.basename(path), f)})
+            response.raise_for_status()
+            job_ids.append(response.json()["job_id"])
+        pending = set(job_ids)
+        while pending:
+            await asyncio.sleep(poll)
+            for job_id in list(pending):
+                job = (await client.get(f"/upload/{job_id}", headers=headers)).json()
+                if job["status"] in ("done", "failed"):
+                    jobs[job_id] = job
+                    pending.discard(job_id)
+    elapsed = time.perf_counter() - start
+    megabytes = sum(os.path.getsize(p) for p in paths) / 1e6
+    chunks = sum(job["chunks_total"] for job in jobs.values())
+    return {
+        "files": len(paths),
+        "failed": sum(job["status"] == "failed" for job in jobs.values()),
+        "megabytes": megabytes,
+        "pages": sum(job["pages_parsed"] for job in jobs.values()),
+        "chunks": chunks,
+        "seconds": elapsed,
+        "files_per_s": len(paths) / elapsed,
+        "mb_per_s": megabytes / elapsed,
+        "chunks_per_s": chunks / elapsed,
+    }
+
+
+async def chat_load(client: httpx.AsyncClient, headers: dict, requests: int, concurrency: int, stream: bool) -> dict:
+    questions = [f"What does section {i % 9 + 1}.{i % 7 + 1} say about the {w} budget?"
+                 for i, w in enumerate(["token", "latency", "offer", "resume"] * (requests // 4 + 1))][:requests]
+    latencies, first_tokens, errors = [], [], 0
+    queue = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            question = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                if stream:
+                    async with client.stream("POST", "/chat", headers=headers,
+                                             json={"message": question, "stream": True}) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if line.startswith("data:") and not first_tokens_seen.get(question):
+                                first_tokens_seen[question] = True
+                                first_tokens.append(time.perf_counter() - start)
+                else:
+                    (await client.post("/chat", headers=headers, json={"message": question})).raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    first_tokens_seen = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    result = {"requests": requests, "concurrency": concurrency, "stream": stream, "errors": errors,
+              "seconds": elapsed, "requests_per_s": len(latencies) / elapsed,
+              "latency_s": percentiles(latencies)}
+    if stream:
+        result["first_token_s"] = percentiles(first_tokens)
+    return result
+
+
+async def drive(args, base_url: str) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        user = {"username": "bench", "email": "bench@example.com", "password": "bench-password"}
+        (await client.post("/register", json=user)).raise_for_status()
+        response = await client.post("/login", data={"username": user["username"], "password": user["password"]})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        paths = generate(os.path.join(args.workdir, "corpus"), args.kinds.split(","), args.files, args.mb, args.seed)
+        results = {"ingest": await ingest(client, headers, paths, args.poll, args.batch)}
+        for stream in ([False, True] if args.stream == "both" else [args.stream == "true"]):
+            key = "chat_stream" if stream else "chat"
+            results[key] = await chat_load(client, headers, args.chat_requests, args.concurrency, stream)
+        results["stage_mean_s"] = stage_means((await client.get("/metrics")).text)
+        return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(baseline: dict, current: dict, prefix: str = ""):
+    """
+    Print numeric fields that moved by more than 5% against the baseline.
+    """
+    for key, value in current.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            compare(old or {}, value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+            change = (value - old) / old
+            if abs(change) > 0.05:
+                print(f"{prefix}{key:<40} {old:>12.4g} -> {value:<12.4g} ({change:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kinds", default="pdf,docx,txt")
+    parser.add_argument("--files", type=int, default=1, help="files per kind")
+    parser.add_argument("--mb", type=float, default=0.5, help="text per file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch", action="store_true", help="upload through /upload/batch in one request")
+    parser.add_argument("--chat-requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stream", choices=["false", "true", "both"], default="both")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds before the first token")
+    parser.add_argument("--llm-tokens", type=int, default=64)
+    parser.add_argument("--llm-token-delay", type=float, default=0.002)
+    parser.add_argument("--database-url", default=None, help="default: SQLite in the work directory")
+    parser.add_argument("--poll", type=float, default=0.2)
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="earlier JSON report to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory and server logs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="ragbench-") as workdir:
+        if args.keep:
+            workdir = tempfile.mkdtemp(prefix="ragbench-")
+        args.workdir = workdir
+        llm_port, app_port = free_port(), free_port()
+        env = {
+            **os.environ,
+            "PYTHONPATH": BACKEND_DIR,
+            "FAKE_LLM_LATENCY": str(args.llm_latency),
+            "FAKE_LLM_TOKENS": str(args.llm_tokens),
+            "FAKE_LLM_TOKEN_DELAY": str(args.llm_token_delay),
+            "LLM_API_URL": f"http://127.0.0.1:{llm_port}/v1/chat/completions",
+            # uvicorn serves the stand-in over HTTP/1.1 only
+            "LLM_HTTP2": "false",
+            "GROQ_API_KEY": "benchmark",
+            "DATABASE_URL": args.database_url or f"sqlite:///{workdir}/bench.db",
+            "VECTOR_BACKEND": "local",
+            "VECTOR_INDEX_DIR": os.path.join(workdir, "vector_index"),
+            "BM25_INDEX_DIR": os.path.join(workdir, "bm25_index"),
+            "EMBED_CACHE_PATH": os.path.join(workdir, "embedding_cache.sqlite"),
+            "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+            "BCRYPT_ROUNDS": "4",
+        }
+        subprocess.run([sys.executable, "create_tables.py"], cwd=BACKEND_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        llm = start_server("benchmarks.fake_llm:app", llm_port, env, os.path.join(workdir, "fake_llm.log"))
+        app = start_server("app.main:app", app_port, env, os.path.join(workdir, "app.log"))
+        try:
+            wait_ready(f"http://127.0.0.1:{llm_port}/docs", llm)
+            cold_start = wait_ready(f"http://127.0.0.1:{app_port}/", app)
+            results = asyncio.run(drive(args, f"http://127.0.0.1:{app_port}"))
+            results["memory_kb"] = memory_kb(app.pid)
+            results["cold_start_s"] = cold_start
+        finally:
+            for process in (app, llm):
+                process.terminate()
+                process.wait(timeout=30)
+        if args.keep:
+            print(f"work directory kept at {workdir}", file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("workdir", "output", "baseline", "keep")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nchanges vs {baseline.get('commit') or args.baseline} (>5%):")
+        compare(baseline.get("results", {}), results)
+
+
+if __name__ == "__main__":
+    main()
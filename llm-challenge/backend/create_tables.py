@@ -1,7 +1,31 @@
+"""
+Schema migration command. The app no longer creates tables on import; run
+this once per deploy, before starting the workers:
+
+    python create_tables.py
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
 from app.database import engine
-from app.models import User, Conversation
-from sqlmodel import SQLModel
+from app.models import Base
+
+# Columns added after their table first shipped: (schema, table, column, DDL type)
+ADDED_COLUMNS = [
+    ("public", "user", "token_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("public", "ingestion_job", "batch_id", "VARCHAR"),
+]
 
 print("Creating tables...")
-SQLModel.metadata.create_all(engine)
+Base.metadata.create_all(engine)
+inspector = inspect(engine)
+with engine.begin() as conn:
+    for schema, table, column, ddl in ADDED_COLUMNS:
+        if column not in {c["name"] for c in inspector.get_columns(table, schema=schema)}:
+            print(f"Adding {table}.{column}")
+            conn.execute(text(f'ALTER TABLE {schema}."{table}" ADD COLUMN {column} {ddl}'))
+    # create_all skips tables that exist, and with them indexes added later
+    # (e.g. ix_conversation_user_timestamp_id): create any that are missing
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
 print("✅ Tables created successfully!")
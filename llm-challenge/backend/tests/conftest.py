@@ -0,0 +1,44 @@
+"""
+Run from llm-challenge/backend:
+    python -m pytest -q
+
+Settings are read when app.config is first imported, so the environment
+is pointed at a scratch directory here: a SQLite database, the local vector
+store and keyword index, the dummy embeddings, and in-thread extraction.
+"""
+import os
+import tempfile
+
+DATA_DIR = tempfile.mkdtemp(prefix="ragworks-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(DATA_DIR, 'app.sqlite')}",
+    "VECTOR_BACKEND": "local",
+    "VECTOR_INDEX_DIR": os.path.join(DATA_DIR, "vector_index"),
+    "BM25_INDEX_DIR": os.path.join(DATA_DIR, "bm25_index"),
+    "EMBED_CACHE_PATH": os.path.join(DATA_DIR, "embedding_cache.sqlite3"),
+    "UPLOAD_DIR": os.path.join(DATA_DIR, "uploads"),
+    "HYBRID_SEARCH": "true",
+    "SEMANTIC_CACHE_ENABLED": "false",
+    "EXTRACT_PROCESSES": "0",
+    "CHUNK_MAX_TOKENS": "32",
+    "CHUNK_OVERLAP_TOKENS": "0",
+    "STARTUP_WARMUP": "false",
+    "GROQ_API_KEY": "test",
+})
+
+import pytest  # noqa: E402
+from app.database import engine, SessionLocal  # noqa: E402
+from app.models import Base  # noqa: E402
+
+Base.metadata.create_all(engine)
+
+
+@pytest.fixture
+def session_factory():
+    """
+    Sessions on the app's database, emptied again after the test.
+    """
+    yield SessionLocal
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
@@ -0,0 +1,36 @@
+import uuid
+from datetime import datetime, timedelta
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt as jose_jwt
+from app.main import app, settings, user_access_token
+from app.models import User
+
+
+@pytest.fixture
+def user(session_factory):
+    with session_factory() as db:
+        user = User(username=f"user-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com",
+                    hashed_password="x")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+        return user
+
+
+def test_tokens_use_the_configured_secret_and_expiry(monkeypatch, user):
+    monkeypatch.setattr(settings, "SECRET_KEY", "a-custom-secret-of-at-least-32-bytes!")
+    monkeypatch.setattr(settings, "ACCESS_TOKEN_EXPIRE_MINUTES", 5)
+    token = user_access_token(user)
+
+    payload = jose_jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    assert payload["uid"] == user.id
+    expires = datetime.utcfromtimestamp(payload["exp"])
+    assert timedelta(minutes=4) < expires - datetime.utcnow() <= timedelta(minutes=5)
+
+    client = TestClient(app)
+    assert client.get("/history", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    forged = jwt.encode({"sub": user.username, "uid": user.id, "ver": 0}, "mysecret", algorithm="HS256")
+    assert client.get("/history", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
@@ -0,0 +1,127 @@
+import os
+import random
+import pytest
+from app.bm25 import BM25Index, tokenize
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa"]
+
+
+def chunk(vector_id: str, text: str, user_id: int = 1, document_id: int = 1) -> dict:
+    return {"id": vector_id, "metadata": {"text": text, "user_id": user_id, "document_id": document_id}}
+
+
+def results(index, query: str, **kwargs):
+    return [(hit["id"], round(hit["score"], 6)) for hit in index.search(query, top_k=50, **kwargs)]
+
+
+def test_tokenize_keeps_identifiers_whole():
+    assert tokenize("Ticket AB-1234 from j.doe@mail.com") == [
+        "ticket", "ab-1234", "ab", "1234", "from", "j.doe@mail.com", "j", "doe", "mail", "com"]
+
+
+def test_add_search_and_scope(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add([
+        chunk("a", "invoice number AB-1234 is overdue", user_id=1, document_id=10),
+        chunk("b", "the quarterly report", user_id=1, document_id=11),
+        chunk("c", "invoice paid", user_id=2, document_id=12),
+    ])
+
+    assert len(index) == 3
+    assert [hit["id"] for hit in index.search("ab-1234")] == ["a"]
+    assert {hit["id"] for hit in index.search("invoice")} == {"a", "c"}
+    assert [hit["id"] for hit in index.search("invoice", user_id=2)] == ["c"]
+    assert [hit["id"] for hit in index.search("invoice", document_ids=[10])] == ["a"]
+    assert index.search("report")[0]["metadata"]["text"] == "the quarterly report"
+    assert index.search("missing") == []
+
+
+def test_add_replaces_and_delete_removes(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add([chunk("a", "alpha beta"), chunk("b", "beta gamma")])
+    index.add([chunk("a", "delta")])
+    assert len(index) == 2
+    assert [hit["id"] for hit in index.search("alpha beta")] == ["b"]
+    assert [hit["id"] for hit in index.search("delta")] == ["a"]
+
+    index.delete(["b", "missing"])
+    assert len(index) == 1
+    assert index.search("beta") == []
+    assert index.search("gamma") == []
+
+
+@pytest.mark.parametrize("merge_postings", [1, 8])
+def test_merges_match_unmerged_index(tmp_path, merge_postings):
+    """
+    Random adds, replacements and deletes score the same whether or not the
+    delta has been merged (and dead documents compacted) along the way.
+    """
+    rng = random.Random(merge_postings)
+    merged = BM25Index(str(tmp_path / "merged"), merge_postings=merge_postings)
+    unmerged = BM25Index(str(tmp_path / "unmerged"), merge_postings=10 ** 9)
+    live = set()
+    for _ in range(60):
+        if live and rng.random() < 0.3:
+            ids = rng.sample(sorted(live), min(len(live), rng.randint(1, 3)))
+            for index in (merged, unmerged):
+                index.delete(ids)
+            live -= set(ids)
+        else:
+            chunks = [chunk(f"c{rng.randint(0, 40)}", " ".join(rng.choices(WORDS, k=rng.randint(1, 8))),
+                            user_id=rng.randint(1, 2)) for _ in range(rng.randint(1, 4))]
+            for index in (merged, unmerged):
+                index.add(chunks)
+            live |= {c["id"] for c in chunks}
+        assert len(merged) == len(unmerged) == len(live)
+
+    assert any(name.startswith("bm25_main.") for name in os.listdir(tmp_path / "merged"))
+    for query in WORDS + ["alpha beta", "gamma zeta kappa"]:
+        assert results(merged, query) == results(unmerged, query)
+        for user_id in (1, 2, 3):
+            assert results(merged, query, user_id=user_id) == results(unmerged, query, user_id=user_id)
+
+    reopened = BM25Index(str(tmp_path / "merged"), merge_postings=merge_postings)
+    assert len(reopened) == len(live)
+    for query in WORDS:
+        assert results(reopened, query) == results(unmerged, query)
+
+
+def test_other_instance_sees_writes_and_merges(tmp_path):
+    writer = BM25Index(str(tmp_path), merge_postings=4)
+    reader = BM25Index(str(tmp_path), merge_postings=4)
+    writer.add([chunk("a", "alpha beta"), chunk("b", "gamma")])
+    assert [hit["id"] for hit in reader.search("alpha")] == ["a"]
+
+    writer.delete(["a"])
+    writer.add([chunk("c", "alpha delta epsilon zeta eta")])
+    assert len(reader) == 2
+    assert [hit["id"] for hit in reader.search("alpha")] == ["c"]
+    assert results(reader, "gamma alpha") == results(writer, "gamma alpha")
+
+
+def test_merge_groups_documents_by_owner(tmp_path):
+    index = BM25Index(str(tmp_path), merge_postings=10 ** 9)
+    index.add([chunk(f"c{i}", "alpha beta" if i % 2 else "alpha", user_id=[2, 1, 3][i % 3]) for i in range(9)])
+    expected = {user_id: results(index, "alpha beta", user_id=user_id) for user_id in (1, 2, 3)}
+    index._merge()
+
+    assert index._main_docs == 9
+    assert index._doc_user.tolist() == sorted(index._doc_user.tolist())
+    # A user's main-segment postings are scored from one run of the term's postings
+    assert {user_id: results(index, "alpha beta", user_id=user_id) for user_id in (1, 2, 3)} == expected
+    index.add([chunk("late", "alpha", user_id=1)])
+    # Equal scores keep the older chunk first
+    assert [hit_id for hit_id, _ in results(index, "alpha", user_id=1)] == ["c4", "late", "c1", "c7"]
+
+
+def test_reorders_index_from_before_owner_numbering(tmp_path):
+    index = BM25Index(str(tmp_path), merge_postings=4)
+    index.add([chunk("a", "alpha", user_id=2), chunk("b", "alpha beta", user_id=1), chunk("c", "beta", user_id=2)])
+    expected = results(index, "alpha beta", user_id=2)
+    with index._db:
+        index._db.execute("DELETE FROM info WHERE key = 'main_docs'")
+
+    reopened = BM25Index(str(tmp_path), merge_postings=4)
+    assert reopened._doc_user.tolist() == [1, 2, 2]
+    assert results(reopened, "alpha beta", user_id=2) == expected
+    assert [hit["id"] for hit in reopened.search("beta", user_id=1)] == ["b"]
@@ -0,0 +1,62 @@
+from app.chunking import chunk_records, chunk_text, count_tokens, is_heading
+
+SENTENCES = [f"Sentence {i} says something about item {i}." for i in range(20)]
+TEXT = " ".join(SENTENCES)
+
+
+def test_chunks_stay_within_max_tokens_and_keep_sentences_whole():
+    chunks = chunk_text(TEXT, source="a.txt", max_tokens=30, overlap_tokens=0)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk["tokens"] <= 30
+        assert chunk["source"] == "a.txt"
+        assert TEXT[chunk["offset"]:].startswith(chunk["text"])
+    assert " ".join(chunk["text"] for chunk in chunks) == TEXT
+
+
+def test_overlap_repeats_trailing_sentences():
+    sentence_tokens = count_tokens(SENTENCES[0])
+    chunks = chunk_text(TEXT, max_tokens=3 * sentence_tokens, overlap_tokens=sentence_tokens)
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last_sentence = previous["text"][previous["text"].rindex("Sentence"):]
+        assert chunk["text"].startswith(last_sentence)
+        assert chunk["tokens"] <= 3 * sentence_tokens
+
+
+def test_long_sentence_is_cut_at_word_boundaries():
+    words = [f"word{i}" for i in range(100)]
+    chunks = chunk_text(" ".join(words), max_tokens=16, overlap_tokens=0)
+
+    assert len(chunks) > 1
+    assert all(chunk["tokens"] <= 16 for chunk in chunks)
+    assert " ".join(chunk["text"] for chunk in chunks).split() == words
+
+
+def test_headings_start_a_new_chunk_and_are_not_overlapped():
+    text = "# Introduction\nThe first part is short.\n\nMETHODS\nThe second part is short too.\n"
+    chunks = chunk_text(text, max_tokens=200, overlap_tokens=50)
+
+    assert [chunk["text"] for chunk in chunks] == [
+        "# Introduction The first part is short.",
+        "METHODS The second part is short too.",
+    ]
+    assert text[chunks[1]["offset"]:].startswith("METHODS")
+
+
+def test_is_heading():
+    assert is_heading("# Title")
+    assert is_heading("2.1 Results")
+    assert is_heading("SUMMARY")
+    assert not is_heading("A normal sentence.")
+    assert not is_heading("x" * 100)
+
+
+def test_line_split_across_pages_is_joined():
+    records = [{"page": 1, "text": "Page one ends mid"}, {"page": 2, "text": "way through a line. Next page.\n"}]
+    chunks = list(chunk_records(records, max_tokens=200, overlap_tokens=0))
+
+    assert [chunk["text"] for chunk in chunks] == ["Page one ends midway through a line. Next page."]
+    assert chunks[0]["page"] == 1
+    assert chunk_text("") == []
@@ -0,0 +1,72 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.main import app, encode_cursor, decode_cursor, user_access_token
+from app.models import User, Conversation
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 5, 17, 9, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm8tc2VwYXJhdG9y", encode_cursor(datetime.utcnow(), 1)[:-4]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.fixture
+def client_and_turns(session_factory):
+    """
+    A signed-in client and its user's turns, oldest first. Several share a
+    timestamp so pages must break ties on id.
+    """
+    start = datetime(2024, 1, 1)
+    with session_factory() as db:
+        user, other = (User(username=f"user-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com",
+                            hashed_password="x") for _ in range(2))
+        db.add_all([user, other])
+        db.flush()
+        turns = [Conversation(user_id=user.id, query=f"q{i}", message=f"q{i}", response=f"r{i}",
+                              timestamp=start + timedelta(minutes=i // 3)) for i in range(11)]
+        db.add_all(turns)
+        db.add(Conversation(user_id=other.id, query="x", message="x", response="x", timestamp=start))
+        db.commit()
+        messages = [turn.message for turn in sorted(turns, key=lambda t: (t.timestamp, t.id))]
+        token = user_access_token(user)
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client, messages
+
+
+def pages(client, **params):
+    cursor, seen = None, []
+    while True:
+        response = client.get("/history", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        seen.append([turn["message"] for turn in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return seen
+
+
+def test_history_pages(client_and_turns):
+    client, messages = client_and_turns
+
+    asc = pages(client, limit=4)
+    assert [len(page) for page in asc] == [4, 4, 3]
+    assert sum(asc, []) == messages
+    desc = pages(client, limit=4, order="desc")
+    assert sum(desc, []) == messages[::-1]
+    assert pages(client, limit=11) == [messages]
+    assert pages(client) == [messages]
+
+
+def test_history_rejects_bad_cursor(client_and_turns):
+    client, _ = client_and_turns
+    response = client.get("/history", params={"cursor": "garbage"})
+    assert response.status_code == 400
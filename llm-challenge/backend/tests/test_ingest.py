@@ -0,0 +1,155 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from app import registry
+from app.bm25 import get_keyword_index
+from app.ingest import IngestionWorker
+from app.models import User, IngestionJob, Document, DocumentChunk
+from app.vector_db import get_store, user_namespace
+
+SENTENCES = [f"Sentence number {i} talks about topic {i} in some detail for the reader." for i in range(12)]
+
+
+@pytest.fixture
+def worker(session_factory):
+    return IngestionWorker(session_factory, threads=1, poll_interval=1, stale_seconds=60)
+
+
+@pytest.fixture
+def user_id(session_factory):
+    with session_factory() as db:
+        user = User(username=f"user-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com",
+                    hashed_password="x")
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def queue_job(session_factory, user_id: int, filename: str, file_path: str = "unused.txt",
+              batch_id: str = None, age: int = 0) -> str:
+    with session_factory() as db:
+        job = IngestionJob(id=uuid.uuid4().hex, user_id=user_id, filename=filename, file_path=file_path,
+                           batch_id=batch_id, created_at=datetime.utcnow() - timedelta(seconds=age))
+        db.add(job)
+        db.commit()
+        return job.id
+
+
+def job_status(session_factory, job_id: str) -> str:
+    with session_factory() as db:
+        return db.get(IngestionJob, job_id).status
+
+
+# ----- claim / requeue -----
+def test_claim_takes_oldest_job_and_its_batch(session_factory, worker, user_id):
+    single = queue_job(session_factory, user_id, "a.txt", age=30)
+    batch_id = uuid.uuid4().hex
+    batch = [queue_job(session_factory, user_id, name, batch_id=batch_id, age=age)
+             for name, age in (("b.txt", 20), ("c.txt", 10))]
+
+    claims = worker._claim()
+    assert claims == [(single, user_id, "unused.txt", "a.txt")]
+    assert job_status(session_factory, single) == "running"
+    assert [claim[0] for claim in worker._claim()] == batch
+    assert [job_status(session_factory, job_id) for job_id in batch] == ["running", "running"]
+    assert worker._claim() is None
+
+
+def test_requeue_stale(session_factory, worker, user_id):
+    stale = queue_job(session_factory, user_id, "a.txt", age=30)
+    fresh = queue_job(session_factory, user_id, "b.txt", age=20)
+    assert len(worker._claim()) == 1 and len(worker._claim()) == 1
+
+    with session_factory() as db:
+        db.get(IngestionJob, stale).updated_at = datetime.utcnow() - timedelta(seconds=120)
+        db.commit()
+    worker._requeue_stale()
+
+    assert job_status(session_factory, stale) == "queued"
+    assert job_status(session_factory, fresh) == "running"
+    assert [claim[0] for claim in worker._claim()] == [stale]
+
+
+def test_claim_takes_oldest_and_waits_for_running_document(session_factory, worker, user_id):
+    first = queue_job(session_factory, user_id, "a.txt", age=30)
+    second = queue_job(session_factory, user_id, "a.txt", age=20)
+    other = queue_job(session_factory, user_id, "b.txt", age=10)
+
+    assert [claim[0] for claim in worker._claim()] == [first]
+    assert job_status(session_factory, first) == "running"
+    # The second upload of a.txt waits while the first is indexed
+    assert [claim[0] for claim in worker._claim()] == [other]
+    assert worker._claim() is None
+
+    with session_factory() as db:
+        db.get(IngestionJob, first).status = "done"
+        db.commit()
+    assert [claim[0] for claim in worker._claim()] == [second]
+
+
+def test_claim_batch_once_per_document(session_factory, worker, user_id):
+    batch_id = uuid.uuid4().hex
+    ids = [queue_job(session_factory, user_id, name, batch_id=batch_id, age=age)
+           for name, age in (("a.txt", 30), ("b.txt", 20), ("a.txt", 10))]
+
+    claims = worker._claim()
+    assert [claim[0] for claim in claims] == ids[:2]
+    assert claims[0][1:] == (user_id, "unused.txt", "a.txt")
+    assert job_status(session_factory, ids[2]) == "queued"
+    assert worker._claim() is None
+
+
+# ----- registry -----
+def test_get_or_create_document(session_factory, user_id):
+    with session_factory() as db:
+        document = registry.get_or_create_document(db, user_id, "a.txt")
+        assert registry.get_or_create_document(db, user_id, "a.txt").id == document.id
+        assert registry.get_or_create_document(db, user_id, "b.txt").id != document.id
+        assert registry.indexed_vector_ids(db, document.id) == set()
+
+
+def ingest(session_factory, worker, user_id: int, path, text: str) -> IngestionJob:
+    path.write_text(text)
+    job_id = queue_job(session_factory, user_id, path.name, file_path=str(path))
+    worker._process(worker._claim())
+    with session_factory() as db:
+        return db.get(IngestionJob, job_id)
+
+
+def test_reupload_indexes_only_changed_chunks(session_factory, worker, user_id, tmp_path):
+    path = tmp_path / "notes.txt"
+    namespace = user_namespace(user_id)
+    first = ingest(session_factory, worker, user_id, path, " ".join(SENTENCES))
+    assert first.status == "done", first.error
+    assert first.chunks_total > 2
+    assert first.vectors_upserted == first.chunks_total
+
+    with session_factory() as db:
+        document = db.query(Document).filter_by(user_id=user_id, filename="notes.txt").one()
+        first_ids = registry.indexed_vector_ids(db, document.id)
+    assert len(first_ids) == first.chunks_total
+
+    # Same bytes: nothing is embedded again
+    unchanged = ingest(session_factory, worker, user_id, path, " ".join(SENTENCES))
+    assert (unchanged.status, unchanged.vectors_upserted) == ("done", 0)
+    assert unchanged.chunks_unchanged == first.chunks_total
+
+    # Edit the last sentence: only the last chunk is new, its old vector goes
+    edited = ingest(session_factory, worker, user_id, path, " ".join(SENTENCES[:-1] + ["A new ending."]))
+    assert edited.status == "done", edited.error
+    assert edited.vectors_upserted == 1
+    assert edited.chunks_unchanged == edited.chunks_total - 1
+
+    with session_factory() as db:
+        chunks = db.query(DocumentChunk).filter_by(document_id=document.id).order_by(DocumentChunk.chunk_index).all()
+        assert db.get(Document, document.id).file_hash == registry.file_sha256(str(path))
+    edited_ids = {chunk.vector_id for chunk in chunks}
+    added, orphaned = edited_ids - first_ids, first_ids - edited_ids
+    assert len(added) == len(orphaned) == 1
+    assert chunks[-1].vector_id in added
+
+    store = get_store()
+    stored = {m["id"] for m in store.query([1.0] + [0.0] * 1023, top_k=100, namespace=namespace)}
+    assert stored == edited_ids
+    keyword_hits = {hit["id"] for hit in get_keyword_index().search("sentence ending", top_k=100, user_id=user_id)}
+    assert keyword_hits == edited_ids
@@ -0,0 +1,24 @@
+import asyncio
+import threading
+from app import llm
+
+
+def test_get_client_creates_one_client(monkeypatch):
+    monkeypatch.setattr(llm.settings, "LLM_HTTP2", False)
+    barrier = threading.Barrier(8)
+    clients = []
+
+    def get():
+        barrier.wait()
+        clients.append(llm.get_client())
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(clients) == 8 and len({id(client) for client in clients}) == 1
+    asyncio.run(llm.close_client())
+    assert clients[0].is_closed
+    assert llm._client is None
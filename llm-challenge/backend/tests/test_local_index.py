@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+from app.local_index import LocalVectorStore
+
+DIM = 16
+
+
+def unit(i: int) -> list:
+    vector = [0.0] * DIM
+    vector[i] = 1.0
+    return vector
+
+
+def vectors(ids, namespace_offset: int = 0) -> list:
+    return [{"id": vid, "values": unit(i + namespace_offset), "metadata": {"text": vid, "document_id": i % 2}}
+            for i, vid in enumerate(ids)]
+
+
+def top_id(store, i: int, **kwargs):
+    matches = store.query(unit(i), top_k=1, **kwargs)
+    return matches[0]["id"] if matches else None
+
+
+@pytest.fixture(params=["float32", "float16", "int8"])
+def dtype(request):
+    return request.param
+
+
+def test_upsert_and_query(tmp_path, dtype):
+    store = LocalVectorStore(str(tmp_path), DIM, dtype=dtype)
+    store.upsert(vectors(["a", "b", "c"]), namespace="user-1")
+    store.upsert(vectors(["x"], namespace_offset=3), namespace="user-2")
+
+    assert len(store) == 4
+    assert top_id(store, 1, namespace="user-1") == "b"
+    assert top_id(store, 1, namespace="user-2") == "x"
+    match = store.query(unit(2), top_k=1)[0]
+    assert match["id"] == "c"
+    assert match["score"] == pytest.approx(1.0, abs=0.01)
+    assert match["metadata"] == {"text": "c", "document_id": 0}
+    assert [m["id"] for m in store.query(unit(0), top_k=3, filter={"document_id": 1})] == ["b"]
+    assert {m["id"] for m in store.query(unit(0), top_k=3, filter={"document_id": {"$in": [0, 1]}},
+                                         namespace="user-1")} == {"a", "b", "c"}
+
+
+def test_upsert_overwrites_in_place(tmp_path, dtype):
+    store = LocalVectorStore(str(tmp_path), DIM, dtype=dtype)
+    store.upsert(vectors(["a", "b"]), namespace="user-1")
+    store.upsert([{"id": "a", "values": unit(5), "metadata": {"text": "moved"}}], namespace="user-2")
+
+    assert len(store) == 2
+    assert top_id(store, 0, namespace="user-1") == "b"
+    match = store.query(unit(5), top_k=1, namespace="user-2")[0]
+    assert (match["id"], match["metadata"]) == ("a", {"text": "moved"})
+
+
+def test_delete_and_compact(tmp_path, dtype):
+    store = LocalVectorStore(str(tmp_path), DIM, dtype=dtype, compact_ratio=1.0)
+    store.upsert(vectors(["a", "b", "c", "d"]), namespace="user-1")
+    store.delete(["a", "c", "missing"])
+
+    assert len(store) == 2
+    assert {m["id"] for m in store.query(unit(0), top_k=10)} == {"b", "d"}
+    store.compact()
+    assert len(store) == 2
+    assert top_id(store, 3, namespace="user-1") == "d"
+    assert {m["id"] for m in store.query(unit(0), top_k=10)} == {"b", "d"}
+
+    store.upsert(vectors(["e"]))
+    assert top_id(store, 0) == "e"
+
+
+def test_delete_past_ratio_compacts(tmp_path, dtype):
+    store = LocalVectorStore(str(tmp_path), DIM, dtype=dtype, compact_ratio=0.25)
+    store.upsert(vectors(["a", "b", "c", "d"]))
+    store.delete(["a", "b"])
+
+    assert store._count == 2
+    assert {m["id"] for m in store.query(unit(0), top_k=10)} == {"c", "d"}
+
+
+def test_reopen(tmp_path, dtype):
+    store = LocalVectorStore(str(tmp_path), DIM, dtype=dtype, compact_ratio=1.0)
+    store.upsert(vectors(["a", "b", "c"]), namespace="user-1")
+    store.delete(["b"])
+    store.upsert(vectors(["z"], namespace_offset=7), namespace="user-2")
+    expected = [store.query(unit(i), top_k=3) for i in range(DIM)]
+
+    reopened = LocalVectorStore(str(tmp_path), DIM, dtype=dtype, compact_ratio=1.0)
+    assert len(reopened) == 3
+    assert [reopened.query(unit(i), top_k=3) for i in range(DIM)] == expected
+    assert top_id(reopened, 7, namespace="user-2") == "z"
+    assert top_id(reopened, 1, namespace="user-1") != "b"
+
+
+def test_other_instance_sees_writes(tmp_path, dtype):
+    writer = LocalVectorStore(str(tmp_path), DIM, dtype=dtype, compact_ratio=1.0)
+    reader = LocalVectorStore(str(tmp_path), DIM, dtype=dtype, compact_ratio=1.0)
+    writer.upsert(vectors(["a", "b", "c"]))
+    assert top_id(reader, 2) == "c"
+
+    writer.delete(["c"])
+    writer.compact()
+    writer.upsert(vectors(["d"], namespace_offset=4))
+    assert len(reader) == 3
+    assert top_id(reader, 4) == "d"
+    assert "c" not in {m["id"] for m in reader.query(unit(2), top_k=10)}
+
+
+@pytest.mark.parametrize("dtype, scan_bytes", [("float16", 2 * DIM), ("int8", DIM + 4)])
+def test_quantized_scan_is_smaller(tmp_path, dtype, scan_bytes):
+    store = LocalVectorStore(str(tmp_path), DIM, dtype=dtype)
+    store.upsert(vectors(["a", "b"]))
+    stats = store.stats()
+
+    assert stats["scan_bytes_per_vector"] == scan_bytes
+    assert stats["disk_bytes_per_vector"] == 4 * DIM + scan_bytes
+    assert store.query(unit(1), top_k=1)[0]["score"] == pytest.approx(1.0, abs=0.01)
+    store.rescore = 4
+    assert store.query(unit(1), top_k=1)[0]["score"] == pytest.approx(1.0)
+
+
+def test_switching_dtype_keeps_vectors(tmp_path):
+    LocalVectorStore(str(tmp_path), DIM, dtype="int8").upsert(vectors(["a", "b"]))
+    store = LocalVectorStore(str(tmp_path), DIM, dtype="float16")
+    assert not (tmp_path / "vectors.i8").exists()
+    assert top_id(store, 1) == "b"
+
+    store = LocalVectorStore(str(tmp_path), DIM, dtype="float32")
+    assert not (tmp_path / "vectors.f16").exists()
+    assert store.stats()["scan_bytes_per_vector"] == 4 * DIM
+    assert top_id(store, 1) == "b"
+
+
+def test_rejects_unknown_dtype_and_wrong_dimension(tmp_path):
+    with pytest.raises(ValueError):
+        LocalVectorStore(str(tmp_path), DIM, dtype="bfloat16")
+    store = LocalVectorStore(str(tmp_path), DIM)
+    with pytest.raises(ValueError):
+        store.upsert([{"id": "a", "values": np.ones(DIM + 1).tolist(), "metadata": {}}])
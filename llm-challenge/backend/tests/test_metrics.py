@@ -0,0 +1,65 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from app import metrics
+from app.main import app
+
+
+def stage_count(pipeline: str, stage: str) -> float:
+    return REGISTRY.get_sample_value("rag_stage_seconds_count", {"pipeline": pipeline, "stage": stage}) or 0.0
+
+
+@pytest.fixture
+def hook_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(metrics, "_hooks", [])
+    metrics.add_hook(lambda pipeline, stage, seconds: calls.append((pipeline, stage, seconds)))
+    return calls
+
+
+def test_span_records_stage(hook_calls):
+    before = stage_count("test-span", "work")
+    timings = metrics.start_request_timings()
+    with metrics.span("work", pipeline="test-span"):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.span("work", pipeline="test-span"):
+            raise RuntimeError
+
+    assert stage_count("test-span", "work") == before + 2
+    assert [stage for stage, _ in timings] == ["work", "work"]
+    assert [(pipeline, stage) for pipeline, stage, _ in hook_calls] == [("test-span", "work")] * 2
+
+
+def test_stage_clock_records_each_stage_once(hook_calls, monkeypatch):
+    ticks = iter(range(100))
+    monkeypatch.setattr(metrics.time, "perf_counter", lambda: next(ticks))
+    clock = metrics.StageClock("test-clock")
+    items = []
+    for item in clock.iterate(["a", "b"], "extract"):
+        with clock.time("chunk"):
+            items.append(item)
+    clock.add("chunk", 0.5)
+
+    # Three next() calls (the last one stopping) and two chunk spans of one tick each
+    assert clock.totals == {"extract": 3, "chunk": 2.5}
+    assert items == ["a", "b"]
+    assert hook_calls == []
+    clock.flush()
+    assert sorted(hook_calls) == [("test-clock", "chunk", 2.5), ("test-clock", "extract", 3)]
+    assert clock.totals == {}
+
+
+def test_server_timing():
+    assert metrics.server_timing([("embed", 0.0123), ("total", 1.5)]) == "embed;dur=12.3, total;dur=1500.0"
+    assert metrics.server_timing([]) == ""
+
+
+def test_metrics_endpoint_and_server_timing_header():
+    with metrics.span("endpoint", pipeline="test-endpoint"):
+        pass
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert 'rag_stage_seconds_count{pipeline="test-endpoint",stage="endpoint"}' in response.text
+    assert response.headers["Server-Timing"].startswith("total;dur=")
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app import passwords
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(passwords.settings, "BCRYPT_ROUNDS", 4)
+    yield
+    passwords.shutdown_pool()
+
+
+def test_hash_and_verify(pool):
+    hashed = asyncio.run(passwords.hash_password("secret"))
+
+    assert hashed.startswith("$2b$04$")
+    assert asyncio.run(passwords.verify_password("secret", hashed)) == (True, None)
+    assert asyncio.run(passwords.verify_password("wrong", hashed)) == (False, None)
+
+
+def test_verify_rehashes_at_the_configured_cost(pool, monkeypatch):
+    hashed = asyncio.run(passwords.hash_password("secret"))
+    monkeypatch.setattr(passwords.settings, "BCRYPT_ROUNDS", 5)
+
+    valid, new_hash = asyncio.run(passwords.verify_password("secret", hashed))
+    assert valid and new_hash.startswith("$2b$05$")
+
+
+def test_saturated_pool_sheds_load(pool, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(passwords, "_slots", slots)
+    slots.acquire()
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(passwords.hash_password("secret"))
+    assert error.value.status_code == 429
+    assert error.value.headers == {"Retry-After": "1"}
+
+    slots.release()
+    asyncio.run(passwords.hash_password("secret"))
+    assert slots.acquire(blocking=False)  # the slot was given back
@@ -0,0 +1,70 @@
+import pytest
+from app import prompt
+from app.chunking import count_tokens
+from app.prompt import build_prompt, dedupe, summarize_turns, truncate
+
+
+def match(vector_id: str, text: str) -> dict:
+    return {"id": vector_id, "metadata": {"text": text}}
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(prompt.settings, "PROMPT_CONTEXT_TOKENS", 30)
+    monkeypatch.setattr(prompt.settings, "PROMPT_DEDUP_THRESHOLD", 0.8)
+    monkeypatch.setattr(prompt.settings, "LLM_CONTEXT_WINDOW", 8192)
+    monkeypatch.setattr(prompt.settings, "LLM_MAX_TOKENS", 512)
+
+
+def test_dedupe_drops_near_duplicates_and_contained_chunks():
+    texts = [
+        "the quarterly report shows revenue grew by ten percent",
+        "The quarterly report shows revenue grew by ten percent!",
+        "report shows revenue grew by ten",
+        "an unrelated passage about the office move",
+    ]
+    assert dedupe(texts, 0.8) == [0, 3]
+    assert dedupe(texts, 1.01) == [0, 1, 2, 3]
+
+
+def test_build_prompt_fits_context_budget_in_rank_order(budget):
+    matches = [match("a", "alpha " * 12), match("b", "beta " * 25), match("c", "gamma " * 12)]
+    text, included = build_prompt("What is alpha?", matches)
+
+    assert [m["id"] for m in included] == ["a", "c"]  # b does not fit after a; c still does
+    assert text == f"Context:\n{'alpha ' * 12}\n{'gamma ' * 12}\n\nUser: What is alpha?\nLLM:"
+
+
+def test_build_prompt_skips_duplicates(budget):
+    matches = [match("a", "the invoice is overdue by ten days"), match("b", "The invoice is overdue by ten days.")]
+    _, included = build_prompt("q", matches)
+
+    assert [m["id"] for m in included] == ["a"]
+
+
+def test_context_shrinks_to_leave_room_for_the_answer(budget, monkeypatch):
+    monkeypatch.setattr(prompt.settings, "LLM_CONTEXT_WINDOW", 50)
+    monkeypatch.setattr(prompt.settings, "LLM_MAX_TOKENS", 30)
+    matches = [match(str(i), f"passage {i} " * 3) for i in range(10)]
+    text, included = build_prompt("a question", matches)
+
+    assert 0 < len(included) < 10
+    assert count_tokens(text) + 30 <= 50
+
+
+def test_history_summary_keeps_newest_turns_within_budget(budget, monkeypatch):
+    monkeypatch.setattr(prompt.settings, "PROMPT_HISTORY_TOKENS", 25)
+    monkeypatch.setattr(prompt.settings, "PROMPT_HISTORY_ANSWER_TOKENS", 6)
+    turns = [(f"question {i}?", f"Answer {i} first. Then a long tail of detail.") for i in range(5)]
+    summary = summarize_turns(turns, 25)
+
+    assert count_tokens(summary) <= 25
+    assert summary.endswith("User: question 4?\nAssistant: Answer 4 first.")
+    assert "question 0" not in summary
+    text, _ = build_prompt("next?", [], history=turns)
+    assert "Conversation so far:\n" + summary in text
+
+
+def test_truncate_keeps_whole_sentences():
+    assert truncate("One two three. Four five six. Seven.", 8) == "One two three. Four five six."
+    assert truncate("a b c d e f g h", 3) == "a b c"
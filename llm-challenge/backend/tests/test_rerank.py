@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+import pytest
+from app import rerank
+from app.rerank import LexicalReranker, Reranker, arerank, within_budget
+
+
+def match(vector_id: str, text: str) -> dict:
+    return {"id": vector_id, "score": 0.0, "metadata": {"text": text}}
+
+
+CANDIDATES = [
+    match("weather", "the weather is mild today"),
+    match("partial", "the invoice was sent"),
+    match("best", "invoice AB-1234 is overdue, the overdue invoice AB-1234 needs payment"),
+]
+
+
+class FixedReranker(Reranker):
+    def __init__(self, scores, delay: float = 0.0):
+        self.scores = scores
+        self.delay = delay
+
+    def score(self, query, texts):
+        time.sleep(self.delay)
+        return [self.scores[text] for text in texts]
+
+
+def test_lexical_reranker_prefers_covering_passages():
+    scores = LexicalReranker().score("overdue invoice AB-1234", [c["metadata"]["text"] for c in CANDIDATES])
+
+    assert scores[2] > scores[1] > scores[0] == 0.0
+    assert LexicalReranker().score("", ["anything"]) == [0.0]
+
+
+def test_arerank_orders_by_score_and_keeps_top_k():
+    ranked = asyncio.run(arerank(LexicalReranker(), "overdue invoice AB-1234", CANDIDATES, top_k=2))
+
+    assert [m["id"] for m in ranked] == ["best", "partial"]
+    assert ranked[0]["rerank_score"] > ranked[1]["rerank_score"]
+
+
+def test_arerank_keeps_retrieval_order_on_timeout_or_error(monkeypatch):
+    monkeypatch.setattr(rerank.settings, "RERANK_TIMEOUT_MS", 20)
+    slow = FixedReranker({c["metadata"]["text"]: i for i, c in enumerate(CANDIDATES)}, delay=0.2)
+    assert [m["id"] for m in asyncio.run(arerank(slow, "q", CANDIDATES, top_k=3))] == ["weather", "partial", "best"]
+
+    broken = FixedReranker({})
+    assert [m["id"] for m in asyncio.run(arerank(broken, "q", CANDIDATES, top_k=3))] == ["weather", "partial", "best"]
+
+
+def test_within_budget_skips_passages_that_do_not_fit():
+    matches = [match("a", "word " * 10), match("b", "word " * 50), match("c", "word " * 5)]
+
+    assert [m["id"] for m in within_budget(matches, top_k=3, token_budget=20)] == ["a", "c"]
+    assert [m["id"] for m in within_budget(matches[1:], top_k=3, token_budget=20)] == ["b"]
+
+
+@pytest.fixture
+def fresh_reranker(monkeypatch):
+    monkeypatch.setattr(rerank, "_reranker", None)
+    monkeypatch.setattr(rerank, "_reranker_ready", False)
+
+
+def test_aget_reranker_builds_off_the_event_loop(monkeypatch, fresh_reranker):
+    built_on = []
+
+    def create(kind):
+        built_on.append(threading.current_thread())
+        return LexicalReranker()
+    monkeypatch.setattr(rerank, "_create_reranker", create)
+
+    async def get_twice():
+        return await rerank.aget_reranker(), await rerank.aget_reranker()
+
+    first, second = asyncio.run(get_twice())
+    assert first is second
+    assert len(built_on) == 1 and built_on[0] is not threading.main_thread()
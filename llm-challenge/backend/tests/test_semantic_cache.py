@@ -0,0 +1,84 @@
+import time
+import numpy as np
+from app.semantic_cache import SemanticCache
+
+DIM = 8
+
+
+def vector(*values) -> list:
+    return list(values) + [0.0] * (DIM - len(values))
+
+
+def cache(**kwargs) -> SemanticCache:
+    return SemanticCache(threshold=0.95, dimension=DIM, **kwargs)
+
+
+def test_hit_needs_similar_query_same_chunks_and_user():
+    semantic = cache()
+    semantic.store(vector(1.0), ["doc1_a", "doc1_b"], "answer", user_id=1)
+
+    assert semantic.lookup(vector(1.0, 0.1), ["doc1_a", "doc1_b"], user_id=1) == "answer"
+    assert semantic.lookup(vector(1.0, 1.0), ["doc1_a", "doc1_b"], user_id=1) is None  # cosine 0.71
+    assert semantic.lookup(vector(1.0), ["doc1_b", "doc1_a"], user_id=1) is None
+    assert semantic.lookup(vector(1.0), ["doc1_a"], user_id=1) is None
+    assert semantic.lookup(vector(1.0), ["doc1_a", "doc1_b"], user_id=2) is None
+    stats = semantic.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 4, 1)
+
+
+def test_best_matching_entry_wins():
+    semantic = cache()
+    semantic.store(vector(1.0, 0.3), ["c"], "close", user_id=1)
+    semantic.store(vector(1.0, 0.05), ["c"], "closest", user_id=1)
+
+    assert semantic.lookup(vector(1.0), ["c"], user_id=1) == "closest"
+
+
+def test_expired_entries_miss(monkeypatch):
+    semantic = cache(ttl_seconds=10)
+    semantic.store(vector(1.0), ["c"], "answer", user_id=1)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+
+    assert semantic.lookup(vector(1.0), ["c"], user_id=1) is None
+    assert semantic.stats()["entries"] == 0
+
+
+def test_full_cache_overwrites_oldest_slot():
+    semantic = cache(max_entries=2)
+    for i, chunk_id in enumerate(["a", "b", "c"]):
+        semantic.store(vector(1.0), [chunk_id], f"answer {i}", user_id=1)
+
+    assert semantic.lookup(vector(1.0), ["a"], user_id=1) is None
+    assert semantic.lookup(vector(1.0), ["c"], user_id=1) == "answer 2"
+    assert set(semantic._by_chunk) == {"b", "c"}
+    assert len(semantic._by_key) == 2
+
+
+def test_invalidate_document_drops_entries_using_its_chunks():
+    semantic = cache()
+    semantic.store(vector(1.0), ["doc1_a", "doc2_x"], "mixed", user_id=1)
+    semantic.store(vector(0.0, 1.0), ["doc2_y"], "other", user_id=1)
+    semantic.invalidate_document(1)
+
+    assert semantic.lookup(vector(1.0), ["doc1_a", "doc2_x"], user_id=1) is None
+    assert semantic.lookup(vector(0.0, 1.0), ["doc2_y"], user_id=1) == "other"
+    assert semantic.stats()["invalidations"] == 1
+    assert "doc2_x" not in semantic._by_chunk
+
+
+def test_lookup_scores_only_its_own_context(monkeypatch):
+    semantic = cache(max_entries=64)
+    for i in range(60):
+        semantic.store(vector(1.0), [f"doc{i}_a"], f"answer {i}", user_id=i)
+    scored = []
+    matmul = np.ndarray.__matmul__
+
+    class Spy(np.ndarray):
+        def __matmul__(self, other):
+            scored.append(self.shape)
+            return matmul(np.asarray(self), other)
+
+    semantic._vectors = semantic._vectors.view(Spy)
+    assert semantic.lookup(vector(1.0), ["doc7_a"], user_id=7) == "answer 7"
+    assert scored == [(DIM,)]
@@ -0,0 +1,96 @@
+import asyncio
+import uuid
+import pytest
+from fastapi import HTTPException
+from app import user_cache as user_cache_module
+from app.database import AsyncSessionLocal
+from app.models import User
+from app.user_cache import UserCache, resolve_user
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = UserCache(ttl_seconds=60)
+    monkeypatch.setattr(user_cache_module, "user_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def user(session_factory):
+    with session_factory() as db:
+        user = User(username=f"user-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com",
+                    hashed_password="x")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+        return user
+
+
+def set_token_version(session_factory, user_id: int, version: int):
+    with session_factory() as db:
+        db.get(User, user_id).token_version = version
+        db.commit()
+
+
+def resolve(payload: dict):
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await resolve_user(payload, db)
+    return asyncio.run(run())
+
+
+def resolve_error(payload: dict) -> str:
+    with pytest.raises(HTTPException) as error:
+        resolve(payload)
+    assert error.value.status_code == 401
+    return error.value.detail
+
+
+def test_warm_cache_skips_the_database(cache, user):
+    assert resolve({"uid": user.id, "ver": 0}).username == user.username
+    assert cache.misses == 1
+
+    async def without_database():
+        return await resolve_user({"uid": user.id, "ver": 0}, db=None)
+    assert asyncio.run(without_database()).id == user.id
+    assert cache.hits == 1
+
+
+def test_older_token_is_revoked(cache, session_factory, user):
+    set_token_version(session_factory, user.id, 1)
+
+    assert resolve({"uid": user.id, "ver": 1}).token_version == 1
+    assert resolve_error({"uid": user.id, "ver": 0}) == "Token revoked"
+
+
+def test_newer_token_refreshes_a_stale_entry(cache, session_factory, user):
+    resolve({"uid": user.id, "ver": 0})
+    # Password changed in another process: this one still caches version 0
+    set_token_version(session_factory, user.id, 1)
+
+    assert resolve({"uid": user.id, "ver": 1}).token_version == 1
+    assert cache.get(user.id).token_version == 1
+    assert resolve_error({"uid": user.id, "ver": 0}) == "Token revoked"
+
+
+def test_token_newer_than_the_database_is_rejected(cache, user):
+    assert resolve_error({"uid": user.id, "ver": 5}) == "Token revoked"
+
+
+def test_unknown_user_and_legacy_token(cache, user):
+    assert resolve_error({"uid": user.id + 1000, "ver": 0}) == "User not found"
+    assert resolve({"sub": user.username}).id == user.id
+    assert resolve_error({}) == "Invalid token payload"
+
+
+def test_user_cache_expiry_and_eviction(monkeypatch):
+    cache = UserCache(ttl_seconds=10, max_entries=2)
+    now = [100.0]
+    monkeypatch.setattr(user_cache_module.time, "monotonic", lambda: now[0])
+    for user_id in (1, 2, 3):
+        cache.put(user_cache_module.CurrentUser(user_id, f"u{user_id}", "e", 0))
+
+    assert cache.get(1) is None and cache.get(3).id == 3
+    now[0] += 11
+    assert cache.get(3) is None
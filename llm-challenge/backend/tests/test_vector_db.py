@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi import HTTPException
+from app import vector_db
+from app.config import settings
+from app.vector_db import PineconeStore, upsert_batches
+
+
+def vector(vector_id: str, dim: int = 4, text: str = "") -> dict:
+    return {"id": vector_id, "values": [0.0] * dim, "metadata": {"text": text}}
+
+
+def test_upsert_batches_respects_count_and_bytes():
+    vectors = [vector(f"v{i}") for i in range(7)]
+    assert [len(b) for b in upsert_batches(vectors, max_vectors=3, max_bytes=10 ** 6, float_bytes=4)] == [3, 3, 1]
+
+    # Each vector is 2 + 4 * 4 + 12 bytes: two fit under 70, a third does not
+    batches = list(upsert_batches(vectors, max_vectors=100, max_bytes=70, float_bytes=4))
+    assert [len(b) for b in batches] == [2, 2, 2, 1]
+    assert [v for b in batches for v in b] == vectors
+
+    # A vector over the limit on its own still goes, alone
+    huge = vector("huge", text="x" * 500)
+    assert [[v["id"] for v in b] for b in upsert_batches([vector("a"), huge, vector("b")], 100, 70, 4)] == [
+        ["a"], ["huge"], ["b"]]
+    assert list(upsert_batches([], 10, 100, 4)) == []
+
+
+class RequestError(Exception):
+    def __init__(self, status):
+        super().__init__(f"status {status}")
+        self.status = status
+
+
+class FakeIndex:
+    """
+    Fails requests per `fail(batch_ids, attempt)`, which returns a status or None.
+    """
+
+    def __init__(self, fail):
+        self.fail = fail
+        self.calls = []
+        self.stored = {}
+
+    def upsert(self, vectors, namespace):
+        ids = [v["id"] for v in vectors]
+        self.calls.append(ids)
+        status = self.fail(ids, sum(call == ids for call in self.calls))
+        if status is not None:
+            raise RequestError(status)
+        self.stored.update({(namespace, v["id"]): v for v in vectors})
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(vector_db.time, "sleep", sleeps.append)
+    monkeypatch.setattr(vector_db, "UPSERT_BACKOFF_SECONDS", 1)
+    monkeypatch.setattr(settings, "PINECONE_UPSERT_RETRIES", 2)
+    return sleeps
+
+
+def store_with(index) -> PineconeStore:
+    store = PineconeStore.__new__(PineconeStore)
+    store.index = index
+    store.float_bytes = 4
+    store._request_errors = (RequestError,)
+    store._upsert_pool = ThreadPoolExecutor(2)
+    return store
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_send_retries_throttling_and_server_errors(sleeps, status):
+    index = FakeIndex(lambda ids, attempt: status if attempt <= 2 else None)
+    summary = store_with(index)._send([vector("a"), vector("b")], "ns")
+
+    assert summary == {"upserted": 2, "requests": 3, "retries": 2, "failed": []}
+    assert sleeps == [1, 2]
+    assert set(index.stored) == {("ns", "a"), ("ns", "b")}
+
+
+def test_send_gives_up_after_retries(sleeps):
+    summary = store_with(FakeIndex(lambda ids, attempt: 503))._send([vector("a")], "ns")
+    assert (summary["upserted"], summary["requests"], summary["failed"]) == (0, 3, ["a"])
+    assert summary["error"] == "status 503"
+
+
+@pytest.mark.parametrize("status", [400, 413])
+def test_send_splits_rejected_batches_down_to_the_bad_vector(sleeps, status):
+    index = FakeIndex(lambda ids, attempt: status if "bad" in ids or len(ids) > 2 else None)
+    batch = [vector(v) for v in ("a", "b", "bad", "c", "d")]
+    summary = store_with(index)._send(batch, "ns")
+
+    assert summary["failed"] == ["bad"]
+    assert summary["upserted"] == 4
+    assert summary["requests"] == len(index.calls)
+    assert index.calls[:3] == [["a", "b", "bad", "c", "d"], ["a", "b"], ["bad", "c", "d"]]
+    assert {vid for _, vid in index.stored} == {"a", "b", "c", "d"}
+    assert sleeps == []
+
+
+def test_send_fails_other_client_errors_at_once(sleeps):
+    index = FakeIndex(lambda ids, attempt: 401)
+    summary = store_with(index)._send([vector("a"), vector("b")], "ns")
+    assert summary["failed"] == ["a", "b"]
+    assert len(index.calls) == 1 and sleeps == []
+
+
+def test_upsert_sends_batches_and_reports_failures(sleeps, monkeypatch):
+    monkeypatch.setattr(settings, "PINECONE_UPSERT_MAX_VECTORS", 2)
+    index = FakeIndex(lambda ids, attempt: None)
+    store = store_with(index)
+    summary = store.upsert([vector(f"v{i}") for i in range(5)], namespace="ns")
+    assert summary == {"upserted": 5, "requests": 3, "retries": 0, "failed": []}
+    assert sorted(len(call) for call in index.calls) == [1, 2, 2]
+
+    store.index = FakeIndex(lambda ids, attempt: 400 if "v3" in ids else None)
+    with pytest.raises(HTTPException) as error:
+        store.upsert([vector(f"v{i}") for i in range(5)], namespace="ns")
+    assert error.value.status_code == 400
+    assert "1 of 5 vectors failed" in error.value.detail